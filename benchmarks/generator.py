@@ -0,0 +1,92 @@
+"""Synthetic claims generator for the benchmarks."""
+
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from claims.parsing import ALLOWED_VERBS
+
+DEFAULT_VERB_MIX = {
+    "read": 0.5,
+    "update": 0.2,
+    "create": 0.1,
+    "admin": 0.1,
+    "delete": 0.1,
+}
+
+# segment names used on each level of the resource tree, cycling after the last one
+_SEGMENT_NAMES = ["clients", "projects", "invoices", "people", "documents"]
+
+
+@dataclass
+class ClaimsProfile:
+    """Shape of the synthetic claims: set size, resource depth, verb mix and prohibited ratio."""
+
+    size: int = 1000
+    min_depth: int = 2
+    max_depth: int = 4
+    verb_mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_VERB_MIX))
+    prohibited_ratio: float = 0.1
+    global_ratio: float = 0.0
+    fan_out: int = 50
+    seed: int = 42
+
+
+class ClaimsGenerator:
+    """Generates deterministic raw claims and queries for a ClaimsProfile."""
+
+    def __init__(self, profile: ClaimsProfile):
+        """Seeds the generator with the profile."""
+        unknown = set(profile.verb_mix) - set(ALLOWED_VERBS)
+        if unknown:
+            raise ValueError(f"unknown verbs in verb_mix: {sorted(unknown)}")
+        self.profile = profile
+        self._rnd = random.Random(profile.seed)
+        self._verbs = list(profile.verb_mix)
+        self._weights = list(profile.verb_mix.values())
+
+    def verb(self) -> str:
+        """Returns a random verb following the verb mix."""
+        return self._rnd.choices(self._verbs, self._weights)[0]
+
+    def resource(self, depth: Optional[int] = None) -> str:
+        """Returns a random resource with the given depth (random in the profile range if None)."""
+        if depth is None:
+            depth = self._rnd.randint(self.profile.min_depth, self.profile.max_depth)
+        parts: List[str] = []
+        for level in range(depth):
+            name = _SEGMENT_NAMES[(level // 2) % len(_SEGMENT_NAMES)]
+            # alternate names and ids: clients.12.projects.3...
+            parts.append(
+                name
+                if level % 2 == 0
+                else str(self._rnd.randrange(self.profile.fan_out))
+            )
+        return ".".join(parts)
+
+    def claim(self) -> str:
+        """Returns a random raw claim."""
+        if self._rnd.random() < self.profile.global_ratio:
+            return f"{self.verb()}:*"
+        return f"{self.verb()}:{self.resource()}"
+
+    def claims(self, size: Optional[int] = None) -> List[str]:
+        """Returns `size` random raw claims, or as many as the profile size if None."""
+        return [
+            self.claim() for _ in range(self.profile.size if size is None else size)
+        ]
+
+    def ability_claims(self) -> Tuple[List[str], List[str]]:
+        """Returns the permitted and prohibited raw claims, split by the prohibited ratio."""
+        prohibited_size = int(self.profile.size * self.profile.prohibited_ratio)
+        return (
+            self.claims(self.profile.size - prohibited_size),
+            self.claims(prohibited_size),
+        )
+
+    def queries(self, count: int) -> List[str]:
+        """Returns random raw queries, always as deep as the deepest claims."""
+        return [
+            f"{self.verb()}:{self.resource(self.profile.max_depth)}"
+            for _ in range(count)
+        ]
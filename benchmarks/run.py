@@ -0,0 +1,354 @@
+"""
+Runs the benchmark suite and writes the results as JSON.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --sizes 10 1000 --compare results.json
+
+Each result is the median time per operation (in nanoseconds) of a benchmark
+for a given claims set size. With `--compare`, the ratio against a previous
+run is printed and the exit code is 1 if any benchmark got slower than the
+threshold.
+"""
+
+import argparse
+import json
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.generator import ClaimsGenerator, ClaimsProfile
+from claims import Ability, build_ability, build_claim_set, extract_verb_resource
+from claims.parsing import ALLOWED_VERBS
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+# name -> builder: given a generator, returns the function to time
+Setup = Callable[[ClaimsGenerator], Callable[[], Any]]
+BENCHMARKS: Dict[str, Setup] = {}
+
+
+def benchmark(name: str) -> Callable[[Setup], Setup]:
+    """Registers a benchmark setup function."""
+
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _cycle(items: List[Any]) -> Iterator[Any]:
+    while True:
+        yield from items
+
+
+@benchmark("parsing.extract_verb_resource")
+def _extract_verb_resource(gen: ClaimsGenerator) -> Callable[[], Any]:
+    queries = _cycle(gen.queries(100))
+    return lambda: extract_verb_resource(next(queries))
+
+
+@benchmark("claim_set.check")
+def _check(gen: ClaimsGenerator) -> Callable[[], Any]:
+    claim_set = build_claim_set(gen.claims())
+    queries = _cycle(gen.queries(100))
+    return lambda: claim_set.check(next(queries))
+
+
+@benchmark("claim_set.check_indexed")
+def _check_indexed(gen: ClaimsGenerator) -> Callable[[], Any]:
+    claim_set = build_claim_set(gen.claims(), indexed=True)
+    queries = _cycle(gen.queries(100))
+    return lambda: claim_set.check(next(queries))
+
+
+@benchmark("claim_set.direct_children_of")
+def _direct_children_of(gen: ClaimsGenerator) -> Callable[[], Any]:
+    claim_set = build_claim_set(gen.claims())
+    queries = _cycle([f"{gen.verb()}:{gen.resource(2)}" for _ in range(100)])
+    return lambda: claim_set.direct_children_of(next(queries))
+
+
+@benchmark("claim_set.direct_descendants_of")
+def _direct_descendants_of(gen: ClaimsGenerator) -> Callable[[], Any]:
+    claim_set = build_claim_set(gen.claims())
+    queries = _cycle([f"{gen.verb()}:{gen.resource(1)}" for _ in range(100)])
+    return lambda: claim_set.direct_descendants_of(next(queries))
+
+
+@benchmark("ability.can")
+def _can(gen: ClaimsGenerator) -> Callable[[], Any]:
+    ability = build_ability(*gen.ability_claims())
+    queries = _cycle(gen.queries(100))
+    return lambda: ability.can(next(queries))
+
+
+@benchmark("ability.can_each_verb")
+def _can_each_verb(gen: ClaimsGenerator) -> Callable[[], Any]:
+    ability = build_ability(*gen.ability_claims())
+    resources = _cycle([gen.resource(3) for _ in range(100)])
+
+    def allowed_verbs() -> List[str]:
+        resource = next(resources)
+        return [v for v in ALLOWED_VERBS if ability.can((v, resource))]
+
+    return allowed_verbs
+
+
+@benchmark("ability.allowed_verbs")
+def _allowed_verbs(gen: ClaimsGenerator) -> Callable[[], Any]:
+    ability = build_ability(*gen.ability_claims())
+    resources = _cycle([gen.resource(3) for _ in range(100)])
+    return lambda: ability.allowed_verbs(next(resources))
+
+
+@benchmark("ability.filter_resources")
+def _filter_resources(gen: ClaimsGenerator) -> Callable[[], Any]:
+    ability = build_ability(*gen.ability_claims())
+    parents = _cycle([(gen.verb(), gen.resource(1)) for _ in range(100)])
+    ids = [str(id_) for id_ in range(1000)]
+
+    def filter_ids() -> int:
+        verb, parent = next(parents)
+        return sum(1 for _ in ability.filter_resources(verb, parent, ids))
+
+    return filter_ids
+
+
+@benchmark("ability.access_to_resources")
+def _access_to_resources(gen: ClaimsGenerator) -> Callable[[], Any]:
+    ability = build_ability(*gen.ability_claims())
+    queries = _cycle([f"{gen.verb()}:{gen.resource(2)}" for _ in range(100)])
+    return lambda: ability.access_to_resources(next(queries))
+
+
+@benchmark("ability.access_to_resources_indexed")
+def _access_to_resources_indexed(gen: ClaimsGenerator) -> Callable[[], Any]:
+    ability = build_ability(*gen.ability_claims(), indexed=True)
+    queries = _cycle([f"{gen.verb()}:{gen.resource(2)}" for _ in range(100)])
+    return lambda: ability.access_to_resources(next(queries))
+
+
+@benchmark("ability.access_tree")
+def _access_tree(gen: ClaimsGenerator) -> Callable[[], Any]:
+    ability = build_ability(*gen.ability_claims())
+    queries = _cycle([f"{gen.verb()}:{gen.resource(1)}" for _ in range(100)])
+    return lambda: ability.access_tree(next(queries), depth=3)
+
+
+@benchmark("ability.build_ability")
+def _build_ability(gen: ClaimsGenerator) -> Callable[[], Any]:
+    permitted, prohibited = gen.ability_claims()
+    return lambda: build_ability(permitted, prohibited)
+
+
+@benchmark("ability.build_ability_trusted")
+def _build_ability_trusted(gen: ClaimsGenerator) -> Callable[[], Any]:
+    permitted, prohibited = gen.ability_claims()
+    return lambda: build_ability(permitted, prohibited, trusted=True)
+
+
+@benchmark("ability.from_bytes")
+def _from_bytes(gen: ClaimsGenerator) -> Callable[[], Any]:
+    data = build_ability(*gen.ability_claims()).to_bytes()
+    return lambda: Ability.from_bytes(data)
+
+
+@benchmark("ability.pickle_loads")
+def _pickle_loads(gen: ClaimsGenerator) -> Callable[[], Any]:
+    data = pickle.dumps(build_ability(*gen.ability_claims()))
+    return lambda: pickle.loads(data)
+
+
+# sample of the argument of a derive method, from the generator and the permitted
+# and prohibited claims the ability was built from
+Sample = Callable[[ClaimsGenerator, List[str], List[str]], Any]
+
+
+def _derive(method: str, sample: Sample) -> Setup:
+    def setup(gen: ClaimsGenerator) -> Callable[[], Any]:
+        permitted, prohibited = gen.ability_claims()
+        ability = build_ability(permitted, prohibited)
+        arg = sample(gen, permitted, prohibited)
+        return lambda: getattr(ability, method)(arg)
+
+    return setup
+
+
+def _extra(gen: ClaimsGenerator, permitted: List[str], prohibited: List[str]) -> Any:
+    return gen.claims(10)
+
+
+_SAMPLES: List[Tuple[str, Sample]] = [
+    ("with_extra_permitted_if_not_checked", _extra),
+    ("with_extra_prohibited_if_not_checked", _extra),
+    ("without_exact_permitted_list", lambda gen, p, f: p[:10]),
+    ("without_exact_prohibited_list", lambda gen, p, f: f[:10]),
+    ("without_exact_permitted", lambda gen, p, f: p[0]),
+    ("without_exact_prohibited", lambda gen, p, f: f[0]),
+]
+
+for _method, _sample in _SAMPLES:
+    BENCHMARKS[f"ability.{_method}"] = _derive(_method, _sample)
+
+
+def time_per_op(
+    func: Callable[[], Any], min_time: float, repeat: int
+) -> Tuple[float, int]:
+    """Returns the median nanoseconds per call of `func`, and the calls per repetition."""
+    number = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9 or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time * 1e8 else 2
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter_ns() - start) / number)
+    return statistics.median(timings), number
+
+
+def run(
+    sizes: List[int],
+    names: List[str],
+    profile: ClaimsProfile,
+    min_time: float,
+    repeat: int,
+) -> List[Dict[str, Any]]:
+    """Runs the given benchmarks for every size, returning one result per pair."""
+    results = []
+    for name in names:
+        for size in sizes:
+            gen = ClaimsGenerator(ClaimsProfile(**{**asdict(profile), "size": size}))
+            ns, number = time_per_op(BENCHMARKS[name](gen), min_time, repeat)
+            results.append(
+                {"name": name, "size": size, "ns_per_op": ns, "number": number}
+            )
+            print(f"{name:55} {size:>7} {ns:>16,.0f} ns/op", file=sys.stderr)
+    return results
+
+
+def compare(
+    results: List[Dict[str, Any]], previous: List[Dict[str, Any]], threshold: float
+) -> bool:
+    """Prints the ratio against the previous results. Returns False if any is above the threshold."""
+    before = {(r["name"], r["size"]): r["ns_per_op"] for r in previous}
+    ok = True
+    for result in results:
+        old = before.get((result["name"], result["size"]))
+        if old is None:
+            continue
+        ratio = result["ns_per_op"] / old
+        mark = ""
+        if ratio > threshold:
+            mark = "  SLOWER"
+            ok = False
+        print(f"{result['name']:55} {result['size']:>7} {ratio:>8.2f}x{mark}")
+    return ok
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--only", nargs="+", default=None, help="benchmark names (prefixes)"
+    )
+    parser.add_argument("--max-depth", type=int, default=ClaimsProfile.max_depth)
+    parser.add_argument(
+        "--prohibited-ratio", type=float, default=ClaimsProfile.prohibited_ratio
+    )
+    parser.add_argument(
+        "--global-ratio", type=float, default=ClaimsProfile.global_ratio
+    )
+    parser.add_argument(
+        "--verb-mix",
+        type=json.loads,
+        default=None,
+        help='e.g. \'{"read": 0.8, "admin": 0.2}\'',
+    )
+    parser.add_argument("--seed", type=int, default=ClaimsProfile.seed)
+    parser.add_argument(
+        "--min-time", type=float, default=0.1, help="seconds per repetition"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--output", help="JSON file to write the results to (stdout if missing)"
+    )
+    parser.add_argument("--compare", help="JSON file with previous results")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parser.add_argument("--list", action="store_true", help="list the benchmark names")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    names = [
+        n
+        for n in BENCHMARKS
+        if not args.only or any(n.startswith(o) for o in args.only)
+    ]
+    profile = ClaimsProfile(
+        max_depth=args.max_depth,
+        prohibited_ratio=args.prohibited_ratio,
+        global_ratio=args.global_ratio,
+        seed=args.seed,
+    )
+    if args.verb_mix:
+        profile.verb_mix = args.verb_mix
+
+    results = run(args.sizes, names, profile, args.min_time, args.repeat)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "profile": asdict(profile),
+            "min_time": args.min_time,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)["results"]
+        if not compare(results, previous, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
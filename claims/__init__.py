@@ -4,23 +4,91 @@
 The __init__.py files are required to make Python treat directories
 containing the file as packages.
 """
+
 from .ability import Ability, build_ability
+from .access_tree import AccessTree
+from .bulk import BulkError, BulkProgress, BulkResult, build_abilities_bulk
 from .claim import Claim, build_claim
 from .claim_set import ClaimSet, build_claim_set
+from .core import (
+    CoreAbility,
+    CoreClaim,
+    CoreClaimSet,
+    build_core_ability,
+    build_core_claim,
+    build_core_claim_set,
+)
 from .errors import InvalidClaimError, InvalidClaimResourceError, InvalidClaimVerbError
-from .parsing import QueryTuple, RawQuery, extract_verb_resource
+from .loader import LoadError, LoadReport, load_abilities, load_claim_sets
+from .matrix import AbilityMatrix
+from .memo import DecisionMemo, DecisionMemoStats
+from .parsing import (
+    ParseCache,
+    ParsedQuery,
+    QueryTuple,
+    RawQuery,
+    disable_parse_cache,
+    disable_trusted_validation,
+    enable_parse_cache,
+    enable_trusted_validation,
+    extract_verb_resource,
+    get_parse_cache,
+    is_trusted_validation_enabled,
+    parse_query,
+)
+from .pool import (
+    InternPool,
+    InternPoolStats,
+    disable_intern_pool,
+    enable_intern_pool,
+    get_intern_pool,
+)
+from .who_can import WhoCanIndex
 
 __all__ = [
     "Ability",
+    "AbilityMatrix",
+    "AccessTree",
+    "build_abilities_bulk",
     "build_ability",
     "build_claim",
     "build_claim_set",
+    "build_core_ability",
+    "build_core_claim",
+    "build_core_claim_set",
+    "BulkError",
+    "BulkProgress",
+    "BulkResult",
     "Claim",
     "ClaimSet",
+    "CoreAbility",
+    "CoreClaim",
+    "CoreClaimSet",
+    "DecisionMemo",
+    "DecisionMemoStats",
+    "disable_intern_pool",
+    "disable_parse_cache",
+    "disable_trusted_validation",
+    "enable_intern_pool",
+    "enable_parse_cache",
+    "enable_trusted_validation",
     "extract_verb_resource",
+    "get_intern_pool",
+    "get_parse_cache",
+    "is_trusted_validation_enabled",
+    "InternPool",
+    "InternPoolStats",
     "InvalidClaimError",
     "InvalidClaimResourceError",
     "InvalidClaimVerbError",
+    "load_abilities",
+    "load_claim_sets",
+    "LoadError",
+    "LoadReport",
+    "ParseCache",
+    "ParsedQuery",
+    "parse_query",
     "QueryTuple",
     "RawQuery",
+    "WhoCanIndex",
 ]
@@ -1,13 +1,44 @@
 """Ability object."""
 
-from typing import Sequence, Union
+import copy
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import key_set
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
-from claims.claim import Claim
-from claims.claim_set import ClaimSet, build_claim_set
-from claims.parsing import QueryTuple, RawQuery, extract_verb_resource
+from claims.access_tree import AccessTree, build_access_tree
+from claims.claim import Claim, construct_model
+from claims.claim_set import ClaimSet, build_claim_set, covered_by_any
+from claims.compiled import CompiledAbility
+from claims.core import CoreAbility
+from claims.memo import DecisionMemo
+from claims.parsing import (
+    SEGMENT_REGEX,
+    ParsedQuery,
+    QueryTuple,
+    RawQuery,
+    mask_verbs,
+    parse_query,
+    verb_mask,
+)
+from claims.pool import get_intern_pool
+from claims.serialization import KIND_ABILITY, dump, load
+
+T = TypeVar("T")
 
 
 class Ability(BaseModel):
@@ -18,19 +49,194 @@ class Ability(BaseModel):
 
     model_config = {"frozen": True}
 
+    _compiled: Optional[CompiledAbility] = PrivateAttr(default=None)
+    _memo: Optional[DecisionMemo] = PrivateAttr(default=None)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compares only permitted and prohibited, ignoring any cached data."""
+        if not isinstance(other, Ability):
+            return NotImplemented
+        return self.permitted == other.permitted and self.prohibited == other.prohibited
+
+    def model_copy(
+        self, *, update: Optional[Mapping[str, Any]] = None, deep: bool = False
+    ) -> "Ability":
+        """Same as in pydantic, but drops the cached data (compiled, memo) if `update` is given."""
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            copied._compiled = None
+            copied._memo = None
+        return copied
+
+    def __deepcopy__(self, memo: Optional[Dict[int, Any]] = None) -> "Ability":
+        """Same as in pydantic, but the copy starts without the cached data (compiled, memo)."""
+        copied = self.__copy__()
+        object.__setattr__(copied, "__dict__", copy.deepcopy(self.__dict__, memo))
+        copied._compiled = None
+        copied._memo = None
+        return copied
+
+    def to_core(self) -> CoreAbility:
+        """Returns the compact CoreAbility representation of this ability."""
+        return CoreAbility(self.permitted.to_core(), self.prohibited.to_core())
+
+    @classmethod
+    def from_core(cls, core: CoreAbility) -> "Ability":
+        """Builds an Ability from a CoreAbility, without validating it again."""
+        return construct_model(
+            cls,
+            permitted=ClaimSet.from_core(core.permitted),
+            prohibited=ClaimSet.from_core(core.prohibited),
+        )
+
+    def __reduce__(self) -> Tuple[Callable[[bytes], "Ability"], Tuple[bytes]]:
+        """Pickles as the compact `to_bytes()` encoding."""
+        return Ability.from_bytes, (self.to_bytes(),)
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns the compact, versioned binary encoding of this ability (see `claims.serialization`):
+        verbs as small integers and resources sharing prefixes with the previous one.
+        """
+        return dump(KIND_ABILITY, [self.permitted.encoded(), self.prohibited.encoded()])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Ability":
+        """Builds an Ability from the result of `to_bytes()`, without validating it again."""
+        permitted, prohibited = load(data, KIND_ABILITY, count=2)
+        return construct_model(
+            cls,
+            permitted=ClaimSet.from_encoded(*permitted),
+            prohibited=ClaimSet.from_encoded(*prohibited),
+        )
+
+    def compile(self) -> CompiledAbility:
+        """
+        Returns (compiling it once) an immutable CompiledAbility, with the same
+        results as this ability but precomputed for repeated checks.
+        """
+        if self._compiled is None:
+            self._compiled = CompiledAbility(self)
+        return self._compiled
+
+    def enable_memo(self, capacity: int = 1024) -> DecisionMemo:
+        """
+        Enables on this ability a memo of the last `capacity` decisions of `can()`,
+        `cannot()`, `is_explicitly_prohibited()` and `access_to_resources()`,
+        replacing any previous one.
+
+        Returns the new memo, so its stats can be exported.
+        """
+        self._memo = DecisionMemo(capacity)
+        return self._memo
+
+    def disable_memo(self) -> None:
+        """Disables the memo of decisions on this ability (the default)."""
+        self._memo = None
+
+    def get_memo(self) -> Optional[DecisionMemo]:
+        """Returns the memo of decisions of this ability, if enabled."""
+        return self._memo
+
     def can(self, query: RawQuery) -> bool:
         """Returns true if a permitted claim checks, and no prohibited claim check."""
-        query_tuple = extract_verb_resource(query)
-        return self.permitted.check(query_tuple) and not self.prohibited.check(
-            query_tuple
-        )
+        parsed = parse_query(query)
+        if self._memo is not None:
+            return self._memo.get("can", parsed, self._can)
+        return self._can(parsed)
+
+    def _can(self, parsed: ParsedQuery) -> bool:
+        return self.permitted.check(parsed) and not self.prohibited.check(parsed)
+
+    def can_many(self, queries: Sequence[RawQuery]) -> List[bool]:
+        """
+        Same as `can()` for each of the queries, returning the results in the same order.
+
+        Queries are parsed once, and each ClaimSet resolves all of them in a single pass.
+        """
+        parsed = [parse_query(q) for q in queries]
+        permitted = self.permitted.check_many(parsed)
+        prohibited = self.prohibited.check_many(parsed)
+        return [p and not f for p, f in zip(permitted, prohibited)]
 
     def cannot(self, query: RawQuery) -> bool:
         """Inverse of can."""
         return not self.can(query)
 
+    def allowed_verbs(self, resource: Optional[str]) -> List[str]:
+        """
+        Returns the verbs for which `can()` the given resource (None for global):
+        permitted and not prohibited, in the order of ALLOWED_VERBS.
+
+        Each ClaimSet answers for every verb at once, in a single pass over its
+        claims (or a single walk of its index), instead of one `can()` per verb.
+        """
+        return mask_verbs(self._allowed_mask(resource))
+
+    def can_any(self, verbs: Iterable[str], resource: Optional[str]) -> bool:
+        """Returns true if `can()` the given resource with any of the verbs (see `allowed_verbs()`)."""
+        return bool(verb_mask(verbs) & self._allowed_mask(resource))
+
+    def can_all(self, verbs: Iterable[str], resource: Optional[str]) -> bool:
+        """Returns true if `can()` the given resource with every one of the verbs (see `allowed_verbs()`)."""
+        mask = verb_mask(verbs)
+        return self._allowed_mask(resource) & mask == mask
+
+    def _allowed_mask(self, resource: Optional[str]) -> int:
+        permitted = self.permitted.checked_verb_mask(resource)
+        if not permitted:
+            return 0
+        return permitted & ~self.prohibited.checked_verb_mask(resource)
+
+    def filter_resources(
+        self, verb: str, parent_resource: Optional[str], ids: Iterable[T]
+    ) -> Iterator[T]:
+        """
+        Lazily yields the ids of `ids` for which `can()` the child resource
+        `parent_resource.id` (just `id` for a None parent) with the given verb, in order.
+
+        The parent is resolved once: if it is prohibited no id is read, if it is
+        permitted every id not prohibited on its own is yielded, otherwise only the
+        ids with a permitted claim of their own. Each id that is a single valid
+        segment is looked up as `str(id)` in the children of the parent, so e.g.
+        database ids can be streamed without building and parsing a query per row.
+        Any other id (e.g. `1.2`) is checked with `can()`.
+        """
+        parsed = parse_query((verb, parent_resource))
+        if self.prohibited.check(parsed):
+            return iter(())
+        prohibited = set(self.prohibited.direct_children_of(parsed))
+        if self.permitted.check(parsed):
+            return self._filter_ids(parsed, ids, prohibited, inside=False)
+        permitted = set(self.permitted.direct_children_of(parsed)) - prohibited
+        return self._filter_ids(parsed, ids, permitted, inside=True)
+
+    def _filter_ids(
+        self, parsed: ParsedQuery, ids: Iterable[T], keys: Set[str], inside: bool
+    ) -> Iterator[T]:
+        """Yields the ids in `keys` (or not in them if not `inside`), checking the ones that are not a segment with `can()`."""
+        prefix = parsed.prefix or ""
+        # a resource on its own is at least 2 characters long
+        min_size = 2 if parsed.prefix is None else 1
+        for id_ in ids:
+            key = str(id_)
+            # the keys come from the claims, so they are valid segments already, and
+            # so are numeric ids (checked without the regex, as the most common ones)
+            if key in keys:
+                if inside:
+                    yield id_
+            elif len(key) >= min_size and (key.isdigit() or SEGMENT_REGEX.match(key)):
+                if not inside:
+                    yield id_
+            elif self.can((parsed.verb, prefix + key)):
+                yield id_
+
     def is_explicitly_prohibited(self, query: RawQuery) -> bool:
         """Returns true if a prohibited claim checks, regardless of permitted."""
+        if self._memo is not None:
+            return self._memo.get(
+                "is_explicitly_prohibited", parse_query(query), self.prohibited.check
+            )
         return self.prohibited.check(query)
 
     def access_to_resources(self, query: RawQuery) -> key_set.KeySet:
@@ -39,7 +245,14 @@ class Ability(BaseModel):
         children of the given query:
         Allows on direct descendants, forbids on direct children
         """
-        qt = extract_verb_resource(query)
+        parsed = parse_query(query)
+        if self._memo is not None:
+            return self._memo.get(
+                "access_to_resources", parsed, self._access_to_resources
+            )
+        return self._access_to_resources(parsed)
+
+    def _access_to_resources(self, qt: ParsedQuery) -> key_set.KeySet:
         allowed = (
             key_set.build_all()
             if self.permitted.check(qt)
@@ -52,11 +265,75 @@ class Ability(BaseModel):
         )
         return allowed.difference(forbidden)
 
+    def access_tree(self, query: RawQuery, depth: int = 1) -> AccessTree:
+        """
+        Returns the access of this ability to the children of the given query (same
+        as `access_to_resources()`) and, down to `depth` levels below, the AccessTree
+        of each child segment mentioned by the claims: e.g. the access of
+        `tree.children["one"]` is the same as `access_to_resources("verb:resource.one")`.
+
+        Built from a single pass over the claims below the query in both (sorted)
+        ClaimSets, instead of one `access_to_resources()` per node of the tree.
+        """
+        if depth < 0:
+            raise ValueError(f"depth should not be negative: {depth}")
+        parsed = parse_query(query)
+        return build_access_tree(
+            parsed.prefix,
+            self.permitted.check(parsed),
+            self.prohibited.check(parsed),
+            self.permitted.claims_below(parsed),
+            self.prohibited.claims_below(parsed),
+            depth,
+        )
+
+    def simplify(self) -> "Ability":
+        """
+        Returns an Ability with the same `can()` for every query, removing the claims
+        that can never change a decision:
+        - claims covered by a broader claim of the same ClaimSet (see `ClaimSet.minimized()`)
+        - permitted claims covered by a prohibited claim, as they can never grant anything
+        - prohibited claims that no permitted claim reaches, as they can never deny anything
+
+        `is_explicitly_prohibited()` and `access_to_resources()` can change, since they
+        also look at those claims. Returns self if there is nothing to remove.
+        """
+        prohibited = self.prohibited.minimized()
+        prohibited_keys = {(c.verb, c.resource) for c in prohibited.claims}
+        permitted = _without_claims(
+            self.permitted.minimized(),
+            lambda c: covered_by_any(c, prohibited_keys, or_equal=True),
+        )
+
+        permitted_keys: Set[QueryTuple] = set()
+        # (verb, resource) with a permitted claim on it or below it
+        reached: Set[QueryTuple] = set()
+        for claim in permitted.claims:
+            permitted_keys.add((claim.verb, claim.resource))
+            reached.add((claim.verb, None))
+            if claim.resource is not None:
+                parts = claim.resource.split(".")
+                for size in range(1, len(parts) + 1):
+                    reached.add((claim.verb, ".".join(parts[:size])))
+
+        prohibited = _without_claims(
+            prohibited,
+            lambda c: (c.verb, c.resource) not in reached
+            and not covered_by_any(c, permitted_keys),
+        )
+        return self._derive(permitted=permitted, prohibited=prohibited)
+
+    def _derive(self, permitted: ClaimSet, prohibited: ClaimSet) -> "Ability":
+        """Returns self if both sets are the same instances, or a new (or pooled) Ability without validating it again."""
+        if permitted is self.permitted and prohibited is self.prohibited:
+            return self
+        return _shared_ability(permitted, prohibited)
+
     def with_extra_permitted_if_not_checked(
         self, queries: Sequence[RawQuery]
     ) -> "Ability":
         """Returns a copy of this ability with the given extra permitted claims, ignoring already checked"""
-        return Ability(
+        return self._derive(
             permitted=self.permitted.add_if_not_checked_list(queries),
             prohibited=self.prohibited,
         )
@@ -65,45 +342,76 @@ class Ability(BaseModel):
         self, queries: Sequence[RawQuery]
     ) -> "Ability":
         """Returns a copy of this ability with the given extra prohibited claims, ignoring already checked"""
-        return Ability(
+        return self._derive(
             permitted=self.permitted,
             prohibited=self.prohibited.add_if_not_checked_list(queries),
         )
 
     def without_exact_permitted_list(self, queries: Sequence[RawQuery]) -> "Ability":
         """Returns a copy of this ability with the same prohibited and removing all the exact permitted given"""
-        return Ability(
+        return self._derive(
             permitted=self.permitted.without_exact_list(queries),
             prohibited=self.prohibited,
         )
 
     def without_exact_prohibited_list(self, queries: Sequence[RawQuery]) -> "Ability":
         """Returns a copy of this ability with the same permitted and removing all the exact prohibited given"""
-        return Ability(
+        return self._derive(
             permitted=self.permitted,
             prohibited=self.prohibited.without_exact_list(queries),
         )
 
     def without_exact_permitted(self, query: RawQuery) -> "Ability":
         """Returns a copy of this ability with the same prohibited and removing the exact permitted given"""
-        return Ability(
+        return self._derive(
             permitted=self.permitted.without_exact(query),
             prohibited=self.prohibited,
         )
 
     def without_exact_prohibited(self, query: RawQuery) -> "Ability":
         """Returns a copy of this ability with the same permitted and removing the exact prohibited given"""
-        return Ability(
+        return self._derive(
             permitted=self.permitted,
             prohibited=self.prohibited.without_exact(query),
         )
 
 
+def _without_claims(claim_set: ClaimSet, remove: Callable[[Claim], bool]) -> ClaimSet:
+    """Returns the ClaimSet without the claims for which `remove` is True (self if none)."""
+    # claims are already valid, so they are given as ParsedQuery to skip validation
+    removed = [ParsedQuery(c.verb, c.resource) for c in claim_set.claims if remove(c)]
+    return claim_set.without_exact_list(removed)
+
+
 def build_ability(
     permitted: Sequence[Union[Claim, str, QueryTuple]],
     prohibited: Sequence[Union[Claim, str, QueryTuple]],
+    indexed: bool = False,
+    trusted: bool = False,
 ) -> Ability:
-    """Builds an Ability from the 2 lists of raw claims: permitted and prohibited."""
-    permitted_claim_set = build_claim_set(permitted)
-    prohibited_claim_set = build_claim_set(prohibited)
-    return Ability(permitted=permitted_claim_set, prohibited=prohibited_claim_set)
+    """
+    Builds an Ability from the 2 lists of raw claims: permitted and prohibited.
+
+    If `indexed` is True, the index of both ClaimSets is built right away.
+    If `trusted` is True, the raw claims are not validated (see `build_claim_set()`).
+    With the intern pool enabled, an equal Ability already in use is returned instead.
+    """
+    permitted_claim_set = build_claim_set(permitted, indexed=indexed, trusted=trusted)
+    prohibited_claim_set = build_claim_set(prohibited, indexed=indexed, trusted=trusted)
+    return _shared_ability(permitted_claim_set, prohibited_claim_set)
+
+
+def _shared_ability(permitted: ClaimSet, prohibited: ClaimSet) -> Ability:
+    """
+    The pooled Ability with these ClaimSets if the intern pool is enabled, or a new one otherwise.
+
+    Both ClaimSets are already built, so there is nothing left to validate.
+    """
+
+    def build() -> Ability:
+        return construct_model(Ability, permitted=permitted, prohibited=prohibited)
+
+    pool = get_intern_pool()
+    if pool is None:
+        return build()
+    return pool.ability(permitted, prohibited, build)
@@ -0,0 +1,107 @@
+"""AccessTree object, the access of an ability to a resource tree several levels deep."""
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import key_set
+
+from claims.claim import Claim
+
+
+class AccessTree(NamedTuple):
+    """
+    Access of an ability to the children of a resource (the `access_to_resources()`
+    KeySet), and the AccessTree of each child segment mentioned by its claims.
+
+    A child segment not in `children` is not mentioned by any claim below the
+    resource, so its own access is all if the segment is in `access`, or none.
+    """
+
+    access: key_set.KeySet
+    children: Dict[str, "AccessTree"]
+
+
+class _Node:
+    """One segment below the query, with what the claims say about it."""
+
+    __slots__ = ("children", "permitted", "prohibited", "permitted_below")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        # a claim ends exactly on this node
+        self.permitted = False
+        self.prohibited = False
+        # a permitted claim ends somewhere below this node
+        self.permitted_below = False
+
+
+def build_access_tree(
+    prefix: Optional[str],
+    permitted: bool,
+    prohibited: bool,
+    permitted_below: Iterable[Claim],
+    prohibited_below: Iterable[Claim],
+    depth: int,
+) -> AccessTree:
+    """
+    Builds the AccessTree of a resource `depth` levels deep, from whether it is
+    permitted and prohibited (a claim on it or above it checks it) and the sorted
+    claims strictly below it, with `prefix` the resource followed by a dot (None
+    for a global query).
+
+    Each claim is visited once, going only `depth + 1` segments down: the last
+    level is only needed to know which children of the deepest nodes are allowed
+    or forbidden.
+    """
+    root = _Node()
+    start = 0 if prefix is None else len(prefix)
+    for claims, is_permitted in ((permitted_below, True), (prohibited_below, False)):
+        for claim in claims:
+            node = root
+            segments = (claim.resource or "")[start:].split(".", depth + 1)
+            ends = len(segments) <= depth + 1
+            for segment in segments[: depth + 1]:
+                if is_permitted:
+                    node.permitted_below = True
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _Node()
+                node = child
+            if not ends:
+                if is_permitted:
+                    node.permitted_below = True
+            elif is_permitted:
+                node.permitted = True
+            else:
+                node.prohibited = True
+    return _access_tree(root, permitted, prohibited, depth)
+
+
+def _access_tree(
+    node: _Node, permitted: bool, prohibited: bool, depth: int
+) -> AccessTree:
+    """Same as `Ability.access_to_resources()` on the node, then down on its children."""
+    allowed = (
+        key_set.build_all()
+        if permitted
+        else key_set.build_some_or_none(
+            _segments(node, lambda c: c.permitted_below or c.permitted)
+        )
+    )
+    forbidden = (
+        key_set.build_all()
+        if prohibited
+        else key_set.build_some_or_none(_segments(node, lambda c: c.prohibited))
+    )
+    children: Dict[str, AccessTree] = {}
+    if depth > 0:
+        for segment, child in node.children.items():
+            children[segment] = _access_tree(
+                child,
+                permitted or child.permitted,
+                prohibited or child.prohibited,
+                depth - 1,
+            )
+    return AccessTree(access=allowed.difference(forbidden), children=children)
+
+
+def _segments(node: _Node, keep: Callable[[_Node], bool]) -> List[str]:
+    return [segment for segment, child in node.children.items() if keep(child)]
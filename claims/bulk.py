@@ -0,0 +1,160 @@
+"""Bulk construction of many abilities, spread across processes."""
+import itertools
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from claims.ability import Ability, build_ability
+from claims.claim import Claim
+from claims.errors import (
+    InvalidClaimError,
+    InvalidClaimResourceError,
+    InvalidClaimVerbError,
+)
+from claims.parsing import QueryTuple
+
+RawClaims = Sequence[Union[Claim, str, QueryTuple]]
+BulkRecord = Tuple[Hashable, RawClaims, RawClaims]
+
+# errors of a single record, collected instead of aborting the whole run
+_RECORD_ERRORS = (
+    InvalidClaimError,
+    InvalidClaimVerbError,
+    InvalidClaimResourceError,
+    TypeError,
+    ValueError,
+)
+
+
+class BulkError(NamedTuple):
+    """A record that could not be built: its key (None if unreadable), position in the input and error."""
+
+    key: Optional[Hashable]
+    position: int
+    error_type: str
+    message: str
+
+
+class BulkProgress(NamedTuple):
+    """Progress of a bulk construction, reported after each chunk."""
+
+    records: int
+    errors: int
+    chunks: int
+
+
+class BulkResult(NamedTuple):
+    """
+    Abilities built in bulk, in the compact `Ability.to_bytes()` encoding, which is
+    cheap to send between processes and to store; plus the records that failed.
+    """
+
+    abilities: Dict[Hashable, bytes]
+    errors: List[BulkError]
+
+    def ability(self, key: Hashable) -> Ability:
+        """Loads the Ability of the given key."""
+        return Ability.from_bytes(self.abilities[key])
+
+    def items(self) -> Iterator[Tuple[Hashable, Ability]]:
+        """Loads every Ability, with its key, in the order of the input."""
+        for key, data in self.abilities.items():
+            yield key, Ability.from_bytes(data)
+
+
+_ChunkResult = Tuple[List[Tuple[Hashable, bytes]], List[BulkError]]
+
+
+def build_abilities_bulk(
+    records: Iterable[BulkRecord],
+    chunk_size: int = 1000,
+    max_workers: Optional[int] = None,
+    trusted: bool = False,
+    progress: Optional[Callable[[BulkProgress], None]] = None,
+    executor: Optional[Executor] = None,
+) -> BulkResult:
+    """
+    Builds an Ability for each `(key, permitted, prohibited)` record, parsing and
+    building them in chunks of `chunk_size` records across a ProcessPoolExecutor
+    (with `max_workers`, all CPUs by default), or across the given `executor`.
+
+    Records are read lazily, with at most two chunks per worker in flight. A record
+    with invalid claims is reported in `errors` and does not stop the run. A repeated
+    key keeps its last ability. `trusted` is passed to `build_ability()`.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size should be a positive integer: {chunk_size}")
+
+    workers = max_workers or os.cpu_count() or 1
+    own_executor = executor is None
+    pool = ProcessPoolExecutor(workers) if executor is None else executor
+
+    abilities: Dict[Hashable, bytes] = {}
+    errors: List[BulkError] = []
+    in_flight: Deque["Future[_ChunkResult]"] = deque()
+    chunks = 0
+    done = 0
+
+    def collect(future: "Future[_ChunkResult]") -> None:
+        nonlocal chunks, done
+        built, failed = future.result()
+        abilities.update(built)
+        errors.extend(failed)
+        chunks += 1
+        done += len(built) + len(failed)
+        if progress is not None:
+            progress(BulkProgress(records=done, errors=len(errors), chunks=chunks))
+
+    try:
+        for chunk in _chunks(records, chunk_size):
+            in_flight.append(pool.submit(_build_chunk, chunk, trusted))
+            if len(in_flight) >= 2 * workers:
+                collect(in_flight.popleft())
+        while in_flight:
+            collect(in_flight.popleft())
+    finally:
+        if own_executor:
+            pool.shutdown(cancel_futures=True)
+
+    return BulkResult(abilities=abilities, errors=errors)
+
+
+def _chunks(
+    records: Iterable[BulkRecord], chunk_size: int
+) -> Iterator[List[Tuple[int, BulkRecord]]]:
+    """The records with their position in the input, in lists of up to `chunk_size`."""
+    numbered = enumerate(records)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _build_chunk(chunk: List[Tuple[int, BulkRecord]], trusted: bool) -> _ChunkResult:
+    """Runs in the workers: builds and encodes the abilities of the chunk."""
+    built: List[Tuple[Hashable, bytes]] = []
+    failed: List[BulkError] = []
+    for position, record in chunk:
+        key: Optional[Hashable] = None
+        try:
+            key, permitted, prohibited = record
+            ability = build_ability(permitted, prohibited, trusted=trusted)
+            built.append((key, ability.to_bytes()))
+        except _RECORD_ERRORS as error:
+            failed.append(BulkError(key, position, type(error).__name__, str(error)))
+    return built, failed
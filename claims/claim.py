@@ -1,9 +1,18 @@
 """Claim object."""
-from typing import Annotated, Any, List, Optional, Union
+import functools
+from typing import Annotated, Any, Optional, Set, Tuple, Type, TypeVar, Union
 
 from pydantic import BaseModel, Field
 
-from claims.parsing import ClaimDict, QueryTuple, RawQuery, extract_verb_resource
+from claims.core import CoreClaim, check_claim, direct_child, direct_descendant
+from claims.parsing import (
+    ClaimDict,
+    ParsedQuery,
+    QueryTuple,
+    RawQuery,
+    extract_verb_resource,
+    parse_query,
+)
 
 
 class Claim(BaseModel):
@@ -44,10 +53,23 @@ class Claim(BaseModel):
         suffix = "*" if self.resource is None else self.resource
         return f"{self.verb}:{suffix}"
 
+    def sort_key(self) -> Tuple[str, str]:
+        """Key with the same order as the comparisons: first verb, then resource (global first)."""
+        return self.verb, "" if self.resource is None else self.resource
+
     def __unicode__(self) -> str:
         """Returns `VERB:*` if global or `VERB:RESOURCE otherwise."""
         return self.__str__()
 
+    def to_core(self) -> CoreClaim:
+        """Returns the compact CoreClaim representation of this claim."""
+        return CoreClaim(self.verb, self.resource)
+
+    @classmethod
+    def from_core(cls, core: CoreClaim) -> "Claim":
+        """Builds a Claim from a CoreClaim, without validating it again."""
+        return construct_model(cls, verb=core.verb, resource=core.resource)
+
     def is_global(self) -> bool:
         """True if this claims represents every resource of a verb (global)."""
         return self.resource is None
@@ -68,25 +90,12 @@ class Claim(BaseModel):
 
     def is_exact(self, query: RawQuery) -> bool:
         """True if this claims represents exactly the same as the given query."""
-        verb, resource = extract_verb_resource(query)
-        return self.has_verb(verb) and self.has_resource(resource)
+        parsed = parse_query(query)
+        return self.verb == parsed.verb and self.resource == parsed.resource
 
     def check(self, query: RawQuery) -> bool:
         """Returns true if this claim includes the given query."""
-        verb, resource = extract_verb_resource(query)
-        if not self.has_verb(verb):
-            return False
-
-        if self.is_global():
-            return True
-
-        if resource is None:
-            return False
-
-        if self.has_resource(resource):
-            return True
-
-        return resource.startswith(f"{self.resource}.")
+        return check_claim(self.verb, self.resource, parse_query(query))
 
     def direct_child_of(self, query: RawQuery) -> Optional[str]:
         """
@@ -102,22 +111,7 @@ class Claim(BaseModel):
         claim.direct_child("read:what.some.stuff")  # => None
         claim.direct_child("read:what.some.stuff.blah")  # => None
         """
-        verb, resource = extract_verb_resource(query)
-        if self.resource is None or not self.has_verb(verb):
-            return None
-
-        my_parts = _extract_parts(self.resource)
-        resource_parts = _extract_parts(resource)
-        if len(my_parts) != (len(resource_parts) + 1):
-            return None
-
-        if resource is None:
-            return my_parts[0]
-
-        if not self.resource.startswith(f"{resource}."):
-            return None
-
-        return f"{self.resource}".replace(f"{resource}.", "")
+        return direct_child(self.verb, self.resource, parse_query(query))
 
     def is_direct_child_of(self, query: RawQuery) -> bool:
         """
@@ -149,21 +143,7 @@ class Claim(BaseModel):
         claim.direct_descendant("read:what.some.stuff")  # => None
         claim.direct_descendant("read:what.some.stuff.blah")  # => None
         """
-        verb, resource = extract_verb_resource(query)
-        if self.resource is None or not self.has_verb(verb):
-            return None
-
-        my_parts = _extract_parts(self.resource)
-
-        if resource is None:
-            return my_parts[0]
-
-        if not self.resource.startswith(f"{resource}."):
-            return None
-
-        resource_parts = _extract_parts(resource)
-        idx = len(resource_parts)
-        return my_parts[idx]
+        return direct_descendant(self.verb, self.resource, parse_query(query))
 
     def is_direct_descendant_of(self, query: RawQuery) -> bool:
         """
@@ -182,7 +162,7 @@ class Claim(BaseModel):
         return self.direct_descendant_of(query) is not None
 
 
-def build_claim(raw: Union[Claim, str, QueryTuple, ClaimDict]) -> Claim:
+def build_claim(raw: Union[Claim, str, QueryTuple, ClaimDict, ParsedQuery]) -> Claim:
     """Parses the raw string and builds a claim with it."""
     if isinstance(raw, Claim):
         return raw
@@ -191,10 +171,36 @@ def build_claim(raw: Union[Claim, str, QueryTuple, ClaimDict]) -> Claim:
     return Claim(verb=verb, resource=resource)
 
 
-def _extract_parts(resource: Optional[str]) -> List[str]:
-    if resource is None:
-        return []
-    return resource.split(".")
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def construct_model(model: Type[ModelT], **values: Any) -> ModelT:
+    """
+    Builds a model from already validated values, skipping pydantic validation.
+
+    Cheaper than `model_construct()`, which still goes through defaults and
+    fields-set bookkeeping. Every field of the model must be given.
+    """
+    instance = object.__new__(model)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", _fields_set(model))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    private = model.__private_attributes__
+    object.__setattr__(
+        instance,
+        "__pydantic_private__",
+        {name: attr.get_default() for name, attr in private.items()}
+        if private
+        else None,
+    )
+    return instance
+
+
+@functools.lru_cache(maxsize=None)
+def _fields_set(model: Type[BaseModel]) -> Set[str]:
+    # all fields are always set, so every instance of a (frozen) model can share
+    # the same set: pydantic copies it before updating it in `model_copy()`
+    return set(model.model_fields)
 
 
 def _compare_strings(a: Optional[str], b: Optional[str]) -> int:
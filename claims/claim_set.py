@@ -1,10 +1,59 @@
 """ClaimSet object, which represents a list of claims."""
-from typing import Any, Callable, List, Optional, Sequence, Set, Union
+import bisect
+import sys
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 
-from claims.claim import Claim, build_claim
-from claims.parsing import QueryTuple, RawQuery, extract_verb_resource
+from claims.claim import Claim, build_claim, construct_model
+from claims.core import (
+    CoreClaimSet,
+    build_core_claim_set,
+    checking_keys,
+    find_claim,
+    range_below,
+    sort_key_of,
+)
+from claims.index import (
+    MATCH,
+    ClaimIndex,
+    direct_children,
+    direct_descendants,
+    verb_mask_of,
+)
+from claims.parsing import (
+    VERB_POSITIONS,
+    ParsedQuery,
+    QueryTuple,
+    RawQuery,
+    extract_resource,
+    extract_trusted_verb_resource,
+    mask_verbs,
+    parse_query,
+)
+from claims.pool import ClaimSetKey, claim_set_key, get_intern_pool
+from claims.serialization import (
+    FLAG_INDEXED,
+    KIND_CLAIM_SET,
+    EncodedClaimSet,
+    dump,
+    load,
+)
+
+# (verb, resource segments) of a claim or a query, see `ClaimSet.check_many()`
+_SegmentKey = Tuple[str, Tuple[str, ...]]
 
 
 class ClaimSet(BaseModel):
@@ -14,6 +63,10 @@ class ClaimSet(BaseModel):
 
     model_config = {"frozen": True}
 
+    _index: Optional[ClaimIndex] = PrivateAttr(default=None)
+    # claims sorted by their resource segments, built (once) by `check_many()`
+    _segment_keys: Optional[List[_SegmentKey]] = PrivateAttr(default=None)
+
     @model_validator(mode="before")
     @classmethod
     def parse_claims(cls, data: Any) -> Any:
@@ -23,70 +76,293 @@ class ClaimSet(BaseModel):
             data["claims"] = build_claim_list(data["claims"])
         return data
 
+    def __eq__(self, other: Any) -> bool:
+        """Compares only the claims, ignoring any cached index."""
+        if not isinstance(other, ClaimSet):
+            return NotImplemented
+        return self.claims == other.claims
+
+    def model_copy(
+        self, *, update: Optional[Mapping[str, Any]] = None, deep: bool = False
+    ) -> "ClaimSet":
+        """Same as in pydantic, but drops the index and the cached keys if `update` is given."""
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            copied._index = None
+            copied._segment_keys = None
+        return copied
+
+    def to_core(self) -> CoreClaimSet:
+        """Returns the compact CoreClaimSet representation of this set."""
+        return CoreClaimSet(c.to_core() for c in self.claims)
+
+    @classmethod
+    def from_core(cls, core: CoreClaimSet) -> "ClaimSet":
+        """Builds a ClaimSet from a CoreClaimSet, without validating it again."""
+        return construct_model(cls, claims=[Claim.from_core(c) for c in core.claims])
+
+    def __reduce__(self) -> Tuple[Callable[[bytes], "ClaimSet"], Tuple[bytes]]:
+        """Pickles as the compact `to_bytes()` encoding."""
+        return ClaimSet.from_bytes, (self.to_bytes(),)
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns the compact, versioned binary encoding of this set (see `claims.serialization`).
+
+        Whether the index was built is kept, so `from_bytes()` builds it again.
+        """
+        return dump(KIND_CLAIM_SET, [self.encoded()])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ClaimSet":
+        """Builds a ClaimSet from the result of `to_bytes()`, without validating it again."""
+        ((claims, flags),) = load(data, KIND_CLAIM_SET, count=1)
+        return cls.from_encoded(claims, flags)
+
+    def encoded(self) -> EncodedClaimSet:
+        """Returns the sorted (verb, resource) of the claims, and the serialization flags."""
+        flags = FLAG_INDEXED if self._index is not None else 0
+        return [(c.verb, c.resource) for c in self.claims], flags
+
+    @classmethod
+    def from_encoded(cls, claims: List[QueryTuple], flags: int) -> "ClaimSet":
+        """Builds a ClaimSet from the result of `encoded()`, without validating it again."""
+        claim_set = construct_model(
+            cls,
+            claims=[construct_model(Claim, verb=v, resource=r) for v, r in claims],
+        )
+        if flags & FLAG_INDEXED:
+            claim_set.build_index()
+        return claim_set
+
+    def build_index(self) -> ClaimIndex:
+        """
+        Builds (once) the segment trie index of the claims and returns it.
+
+        Once built, `check()` walks the index instead of scanning every claim.
+        """
+        if self._index is None:
+            self._index = ClaimIndex(self.claims)
+        return self._index
+
+    def is_indexed(self) -> bool:
+        """Returns True if the index has been built for this ClaimSet."""
+        return self._index is not None
+
     def claims_strings(self) -> list[str]:
         """Returns a list of strings representing the claims."""
         return [str(x) for x in self.claims]
 
     def check(self, query: RawQuery) -> bool:
         """Returns True if any of the claims checks for the given query."""
-        query_tuple = extract_verb_resource(query)
+        parsed = parse_query(query)
+        if self._index is not None:
+            return self._index.check(parsed.verb, parsed.segments)
         for claim in self.claims:
-            if claim.check(query_tuple):
+            if claim.check(parsed):
                 return True
         return False
 
+    def check_many(self, queries: Sequence[RawQuery]) -> List[bool]:
+        """
+        Same as `check()` for each of the queries, returning the results in the same order.
+
+        With the index, each query walks it. Otherwise, all queries are parsed up
+        front and sorted by their resource segments, so the ones sharing a prefix
+        are resolved together in a single merged pass over the claims sorted the
+        same way (sorted once per ClaimSet, and kept).
+        """
+        parsed_queries = [parse_query(q) for q in queries]
+        if self._index is not None:
+            index = self._index
+            return [index.check(p.verb, p.segments) for p in parsed_queries]
+
+        keys = [_query_key(p) for p in parsed_queries]
+        claim_keys = self._sorted_segment_keys()
+        results = [False] * len(keys)
+
+        # broadest claim checking the current position of the pass, if any
+        covering: Optional[_SegmentKey] = None
+        pos = 0
+        for idx in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[idx]
+            while pos < len(claim_keys) and claim_keys[pos] <= key:
+                if covering is None or not _is_ancestor(covering, claim_keys[pos]):
+                    covering = claim_keys[pos]
+                pos += 1
+
+            if covering is not None and not _is_ancestor(covering, key):
+                covering = None
+            results[idx] = covering is not None
+
+        return results
+
+    def _sorted_segment_keys(self) -> List[_SegmentKey]:
+        """Keys of the claims sorted by their resource segments, built once."""
+        if self._segment_keys is None:
+            self._segment_keys = sorted(_claim_key(c) for c in self.claims)
+        return self._segment_keys
+
+    def checked_verbs(self, resource: Optional[str]) -> List[str]:
+        """
+        Returns the verbs for which the claims check the given resource (None for
+        global), in the order of ALLOWED_VERBS.
+
+        With the index, a single walk of the resource segments answers for every
+        verb at once; otherwise, a single pass over the claims.
+        """
+        return mask_verbs(self.checked_verb_mask(resource))
+
+    def checked_verb_mask(self, resource: Optional[str]) -> int:
+        """Same as `checked_verbs()`, as a verb mask (see `verb_mask()`)."""
+        resource = extract_resource(resource)
+        segments = () if resource is None else resource.split(".")
+        if self._index is not None:
+            bits, _ = self._index.walk_all(segments)
+            return verb_mask_of(bits, MATCH)
+
+        checking = {".".join(segments[:size]) for size in range(1, len(segments) + 1)}
+        mask = 0
+        for claim in self.claims:
+            if claim.resource is None or claim.resource in checking:
+                position = VERB_POSITIONS.get(claim.verb)
+                if position is not None:
+                    mask |= 1 << position
+        return mask
+
     def add_if_not_checked(self, query: RawQuery) -> "ClaimSet":
         """If the query is checked, returns self. Otherwise, it returns a new Claim with this query added."""
-        if self.check(query):
-            return self
-
-        claims = self.claims.copy()
-        claims.append(build_claim(query))
-        sorted_claims = sorted(claims)
-        return ClaimSet(claims=sorted_claims)
+        return self.add_if_not_checked_list([query])
 
     def add_if_not_checked_list(self, queries: Sequence[RawQuery]) -> "ClaimSet":
-        """Same as `add_if_not_checked` but for a list of queries. They are checked before anyone is added."""
-        valid_queries = [q for q in queries if not self.check(q)]
-        if len(valid_queries) == 0:
+        """
+        Same as `add_if_not_checked` but for a list of queries. They are checked before anyone is added.
+
+        Without the index, each query is checked with a bisect of the sorted claims
+        per checking key (see `checking_keys()`), instead of a scan of all of them.
+        The new claims are inserted in place (bisect) in a copy of the sorted claims,
+        sharing the Claim objects, and the index (if built) with this ClaimSet.
+        """
+        new_claims: Dict[QueryTuple, Claim] = {}
+        for query in queries:
+            parsed = parse_query(query)
+            if not self._is_checked(parsed):
+                key = (parsed.verb, parsed.resource)
+                if key not in new_claims:
+                    new_claims[key] = build_claim(parsed)
+
+        if len(new_claims) == 0:
             return self
 
         claims = self.claims.copy()
-        for query in valid_queries:
-            claims.append(build_claim(query))
-        sorted_claims = sorted(claims)
-        return ClaimSet(claims=sorted_claims)
+        for claim in new_claims.values():
+            bisect.insort(claims, claim, key=Claim.sort_key)
+
+        return self._derive(claims, added=new_claims.values())
+
+    def minimized(self) -> "ClaimSet":
+        """
+        Returns a ClaimSet without the claims covered by a broader claim of the same verb
+        (e.g. `read:clients.1` next to `read:clients` or `read:*`), with the same checks.
+
+        Returns self if there is nothing to remove.
+        """
+        # broader claims come first in the sorted list, so one pass is enough
+        kept_keys: Set[QueryTuple] = set()
+        kept: List[Claim] = []
+        removed: List[Claim] = []
+        for claim in self.claims:
+            if covered_by_any(claim, kept_keys):
+                removed.append(claim)
+            else:
+                kept.append(claim)
+                kept_keys.add((claim.verb, claim.resource))
+
+        if len(removed) == 0:
+            return self
+        return self._derive(kept, removed=removed)
 
     def has_exact(self, query: RawQuery) -> bool:
         """Returns True if the query is checked in the claims."""
-        return any(c.is_exact(query) for c in self.claims)
+        parsed = parse_query(query)
+        if self._index is not None:
+            return self._index.has_exact(parsed.verb, parsed.segments)
+        return self._position(parsed) is not None
+
+    def _is_checked(self, parsed: ParsedQuery) -> bool:
+        """Same as `check()`, looking up each checking key in the (sorted) claims if not indexed."""
+        if self._index is not None:
+            return self._index.check(parsed.verb, parsed.segments)
+        return any(self._position_of(key) is not None for key in checking_keys(parsed))
+
+    def _position(self, parsed: ParsedQuery) -> Optional[int]:
+        """Position of the claim exactly equal to the query in the (sorted) claims, if any."""
+        return self._position_of((parsed.verb, parsed.resource))
+
+    def _position_of(self, key: QueryTuple) -> Optional[int]:
+        """Position of the claim with the given (verb, resource) in the (sorted) claims, if any."""
+        return find_claim(self.claims, key, Claim.sort_key)
 
     def without_exact(self, query: RawQuery) -> "ClaimSet":
         """Returns a new ClaimSet removing any claim that is_exact to the given query."""
-        if not self.has_exact(query):
+        idx = self._position(parse_query(query))
+        if idx is None:
             return self
 
-        claims = [c for c in self.claims if not c.is_exact(query)]
-        return ClaimSet(claims=claims)
+        claims = self.claims.copy()
+        removed = claims.pop(idx)
+        return self._derive(claims, removed=[removed])
 
     def without_exact_list(self, queries: Sequence[RawQuery]) -> "ClaimSet":
         """Returns a new ClaimSet removing any claim that is_exact to any of the given queries."""
-        # convert to tuples once, to avoid doing it multiple times in the next loop
-        tuples = [extract_verb_resource(q) for q in queries]
-        surviving_claims = [
-            c for c in self.claims if not any(c.is_exact(q) for q in tuples)
-        ]
-        if len(surviving_claims) == len(self.claims):
+        # parse once into a set of (verb, resource), so each claim is a single lookup
+        keys = {(p.verb, p.resource) for p in map(parse_query, queries)}
+        surviving_claims: List[Claim] = []
+        removed: List[Claim] = []
+        for claim in self.claims:
+            if (claim.verb, claim.resource) in keys:
+                removed.append(claim)
+            else:
+                surviving_claims.append(claim)
+
+        if len(removed) == 0:
             return self
-        return ClaimSet(claims=surviving_claims)
+        return self._derive(surviving_claims, removed=removed)
+
+    def _derive(
+        self,
+        claims: List[Claim],
+        added: Iterable[Claim] = (),
+        removed: Iterable[Claim] = (),
+    ) -> "ClaimSet":
+        """
+        New ClaimSet with the given (sorted) claims, deriving the index if this one is indexed.
+
+        With the intern pool enabled, an equal ClaimSet already in use is returned instead.
+        """
+
+        def build() -> ClaimSet:
+            derived = construct_model(ClaimSet, claims=claims)
+            if self._index is not None:
+                derived._index = self._index.with_claims(added).without_claims(removed)
+            return derived
+
+        shared = _shared(lambda: claim_set_key(claims), build)
+        if self._index is not None:
+            shared.build_index()
+        return shared
 
     def direct_children_of(self, query: RawQuery) -> List[str]:
         """
         Collects from the claims of the set the result of `direct_child_of()`.
         Removes Nones
         """
+        parsed = parse_query(query)
+        if self._index is not None:
+            _, node = self._index.walk(parsed.verb, parsed.segments)
+            return sorted(direct_children(node, parsed.verb, MATCH))
         return self._map_in_claims(
-            query, child_for=lambda claim, qt: claim.direct_child_of(qt)
+            parsed, child_for=lambda claim, qt: claim.direct_child_of(qt)
         )
 
     def direct_descendants_of(self, query: RawQuery) -> List[str]:
@@ -94,36 +370,155 @@ class ClaimSet(BaseModel):
         Collects from the claims of the set the result of `direct_descendant_of()`.
         Removes Nones
         """
+        parsed = parse_query(query)
+        if self._index is not None:
+            _, node = self._index.walk(parsed.verb, parsed.segments)
+            return sorted(direct_descendants(node, parsed.verb, MATCH))
         return self._map_in_claims(
-            query, child_for=lambda claim, qt: claim.direct_descendant_of(qt)
+            parsed, child_for=lambda claim, qt: claim.direct_descendant_of(qt)
         )
 
+    def claims_below(self, query: RawQuery) -> List[Claim]:
+        """
+        Returns the claims with the verb of the query on a resource strictly below
+        it (any resource for a global query), in order: a slice of the sorted claims.
+        """
+        parsed = parse_query(query)
+        lo, hi = self._range_below(parsed)
+        if lo < hi and self.claims[lo].resource is None:
+            lo += 1
+        return self.claims[lo:hi]
+
     def _map_in_claims(
-        self, query: RawQuery, child_for: Callable[[Claim, QueryTuple], Optional[str]]
+        self,
+        parsed: ParsedQuery,
+        child_for: Callable[[Claim, ParsedQuery], Optional[str]],
     ) -> List[str]:
-        query_tuple = extract_verb_resource(query)
         children_set: Set[str] = set()
-        for claim in self.claims:
-            child = child_for(claim, query_tuple)
+        lo, hi = self._range_below(parsed)
+        for idx in range(lo, hi):
+            child = child_for(self.claims[idx], parsed)
             if child is not None:
                 children_set.add(child)
 
         return sorted(list(children_set))
 
+    def _range_below(self, parsed: ParsedQuery) -> Tuple[int, int]:
+        """
+        Range in the (sorted) claims that can be below the query: every claim of
+        the verb for a global query, or the ones starting with `resource.` otherwise.
+        """
+        return range_below(self.claims, parsed, Claim.sort_key)
+
+
+def _query_key(parsed: ParsedQuery) -> _SegmentKey:
+    """Sorting key where every claim comes right before all the queries it checks."""
+    return parsed.verb, parsed.segments
+
+
+def _claim_key(claim: Claim) -> _SegmentKey:
+    return claim.verb, (
+        () if claim.resource is None else tuple(claim.resource.split("."))
+    )
+
+
+def _is_ancestor(a: _SegmentKey, b: _SegmentKey) -> bool:
+    """True if a claim with key `a` checks a query with key `b`."""
+    return a[0] == b[0] and b[1][: len(a[1])] == a[1]
+
+
+def covered_by_any(claim: Claim, keys: Set[QueryTuple], or_equal: bool = False) -> bool:
+    """
+    True if any of the given (verb, resource) is a broader claim than this one
+    (or the same claim, if `or_equal`).
+    """
+    if or_equal and (claim.verb, claim.resource) in keys:
+        return True
+    if claim.resource is None:
+        return False
+    if (claim.verb, None) in keys:
+        return True
+    resource = claim.resource
+    idx = resource.find(".")
+    while idx != -1:
+        if (claim.verb, resource[:idx]) in keys:
+            return True
+        idx = resource.find(".", idx + 1)
+    return False
+
 
 def build_claim_set(
-    raw_list: ClaimSet | Sequence[Union[Claim, str, QueryTuple]]
+    raw_list: ClaimSet | Sequence[Union[Claim, str, QueryTuple]],
+    indexed: bool = False,
+    minimize: bool = False,
+    trusted: bool = False,
 ) -> ClaimSet:
-    """Given a list of raw claims and returns a ClaimSet with the parsed claims."""
-    if isinstance(raw_list, ClaimSet):
-        return raw_list
+    """
+    Given a list of raw claims and returns a ClaimSet with the parsed claims.
 
-    return ClaimSet(claims=build_claim_list(raw_list))
+    If `minimize` is True, claims covered by broader ones are removed (see `minimized()`).
+    If `indexed` is True, the segment trie index is built right away.
+    If `trusted` is True, the raw claims are expected to be valid already (e.g. read
+    from storage where they were validated on write) and are not validated again,
+    unless `enable_trusted_validation()` is called (meant for debugging and tests).
+
+    With the intern pool enabled (see `enable_intern_pool()`), an equal ClaimSet
+    already in use is returned instead of a new one.
+    """
+    claim_set: ClaimSet
+    if isinstance(raw_list, ClaimSet):
+        existing = raw_list
+        claim_set = _shared(lambda: claim_set_key(existing.claims), lambda: existing)
+    elif trusted:
+        keys = _trusted_keys(raw_list)
+        claim_set = _shared(lambda: tuple(keys), lambda: ClaimSet.from_encoded(keys, 0))
+    else:
+        core = _build_core(raw_list)
+        claim_set = _shared(
+            lambda: claim_set_key(core.claims), lambda: ClaimSet.from_core(core)
+        )
+    if minimize:
+        claim_set = claim_set.minimized()
+    if indexed:
+        claim_set.build_index()
+    return claim_set
 
 
 def build_claim_list(raw_list: Sequence[Union[Claim, str, QueryTuple]]) -> List[Claim]:
     """Given a list of raw claims and returns a list of parsed claims."""
-    raw_set = set(raw_list)
-    claims = [build_claim(x) for x in raw_set]
+    return [Claim.from_core(c) for c in _build_core(raw_list).claims]
+
+
+def _build_core(raw_list: Sequence[Union[Claim, str, QueryTuple]]) -> CoreClaimSet:
+    """Parses the raw claims into a sorted CoreClaimSet without duplicates."""
+    return build_core_claim_set(
+        x.to_core() if isinstance(x, Claim) else x for x in raw_list
+    )
+
+
+def _trusted_keys(
+    raw_list: Sequence[Union[Claim, str, QueryTuple]],
+) -> List[QueryTuple]:
+    """Sorted unique (verb, resource) of the trusted raw claims, to build the ClaimSet straight from."""
+    keys = {
+        (
+            (x.verb, x.resource)
+            if isinstance(x, Claim)
+            else extract_trusted_verb_resource(x)
+        )
+        for x in raw_list
+    }
+    return sorted(map(_interned, keys), key=sort_key_of)
+
+
+def _shared(key: Callable[[], ClaimSetKey], build: Callable[[], ClaimSet]) -> ClaimSet:
+    """The pooled ClaimSet for the key if the intern pool is enabled, or the result of `build()` otherwise."""
+    pool = get_intern_pool()
+    if pool is None:
+        return build()
+    return pool.claim_set(key(), build)
+
 
-    return sorted(claims)
+def _interned(key: QueryTuple) -> QueryTuple:
+    verb, resource = key
+    return sys.intern(verb), None if resource is None else sys.intern(resource)
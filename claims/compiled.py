@@ -0,0 +1,137 @@
+"""CompiledAbility object, an immutable decision engine built from an Ability."""
+from typing import TYPE_CHECKING, Any, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import key_set
+
+from claims.index import (
+    PERMITTED,
+    PROHIBITED,
+    ClaimIndex,
+    direct_children,
+    direct_descendants,
+    verb_mask_of,
+)
+from claims.parsing import (
+    RawQuery,
+    extract_resource,
+    mask_verbs,
+    parse_query,
+    verb_mask,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from claims.ability import Ability
+
+
+class CompiledAbility:
+    """
+    Immutable decision engine precomputed from an Ability.
+
+    Permitted and prohibited claims are stored in the same segment trie, so a
+    decision walks the segments of the query only once, and any prohibited
+    claim found on the way overrides the permitted ones.
+
+    Verbs with a global permitted claim and no prohibited claims are granted
+    right away, and verbs with a global prohibited claim or without permitted
+    claims are denied right away, without walking the trie.
+    """
+
+    __slots__ = ("ability", "_index", "_granted", "_denied")
+
+    ability: "Ability"
+    _index: ClaimIndex
+    _granted: FrozenSet[str]
+    _denied: FrozenSet[str]
+
+    def __init__(self, ability: "Ability"):
+        """Compiles the given ability."""
+        index = ClaimIndex(ability.permitted.claims, PERMITTED)
+        index.add(ability.prohibited.claims, PROHIBITED)
+
+        granted: Set[str] = set()
+        denied: Set[str] = set()
+        for verb in index.verbs():
+            global_flags, all_flags = index.verb_flags(verb)
+            if global_flags & PROHIBITED or not all_flags & PERMITTED:
+                denied.add(verb)
+            elif global_flags & PERMITTED and not all_flags & PROHIBITED:
+                granted.add(verb)
+
+        object.__setattr__(self, "ability", ability)
+        object.__setattr__(self, "_index", index)
+        object.__setattr__(self, "_granted", frozenset(granted))
+        object.__setattr__(self, "_denied", frozenset(denied))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Raises AttributeError: CompiledAbility is immutable."""
+        raise AttributeError(f"CompiledAbility is immutable, cannot set {name}")
+
+    def __reduce__(self) -> Tuple[type, Tuple["Ability"]]:
+        """Pickles (and copies) as the ability, compiling it again."""
+        return CompiledAbility, (self.ability,)
+
+    def can(self, query: RawQuery) -> bool:
+        """Returns true if a permitted claim checks, and no prohibited claim check."""
+        parsed = parse_query(query)
+        if parsed.verb in self._granted:
+            return True
+        if parsed.verb in self._denied:
+            return False
+        flags, _ = self._index.walk(parsed.verb, parsed.segments)
+        return flags & (PERMITTED | PROHIBITED) == PERMITTED
+
+    def cannot(self, query: RawQuery) -> bool:
+        """Inverse of can."""
+        return not self.can(query)
+
+    def allowed_verbs(self, resource: Optional[str]) -> List[str]:
+        """
+        Returns the verbs for which `can()` the given resource (None for global),
+        in the order of ALLOWED_VERBS, from a single walk of the resource segments.
+        """
+        return mask_verbs(self._allowed_mask(resource))
+
+    def can_any(self, verbs: Iterable[str], resource: Optional[str]) -> bool:
+        """Returns true if `can()` the given resource with any of the verbs."""
+        return bool(verb_mask(verbs) & self._allowed_mask(resource))
+
+    def can_all(self, verbs: Iterable[str], resource: Optional[str]) -> bool:
+        """Returns true if `can()` the given resource with every one of the verbs."""
+        mask = verb_mask(verbs)
+        return self._allowed_mask(resource) & mask == mask
+
+    def _allowed_mask(self, resource: Optional[str]) -> int:
+        resource = extract_resource(resource)
+        bits, _ = self._index.walk_all(() if resource is None else resource.split("."))
+        return verb_mask_of(bits, PERMITTED) & ~verb_mask_of(bits, PROHIBITED)
+
+    def is_explicitly_prohibited(self, query: RawQuery) -> bool:
+        """Returns true if a prohibited claim checks, regardless of permitted."""
+        parsed = parse_query(query)
+        if parsed.verb in self._granted:
+            return False
+        return self._index.check(parsed.verb, parsed.segments, PROHIBITED)
+
+    def access_to_resources(self, query: RawQuery) -> key_set.KeySet:
+        """
+        Returns a KeySet describing the access of this ability to the
+        children of the given query:
+        Allows on direct descendants, forbids on direct children
+        """
+        parsed = parse_query(query)
+        flags, node = self._index.walk(parsed.verb, parsed.segments)
+        allowed = (
+            key_set.build_all()
+            if flags & PERMITTED
+            else key_set.build_some_or_none(
+                direct_descendants(node, parsed.verb, PERMITTED)
+            )
+        )
+        forbidden = (
+            key_set.build_all()
+            if flags & PROHIBITED
+            else key_set.build_some_or_none(
+                direct_children(node, parsed.verb, PROHIBITED)
+            )
+        )
+        return allowed.difference(forbidden)
@@ -0,0 +1,465 @@
+"""Compact claim core, without pydantic: __slots__ objects with interned strings."""
+import bisect
+import sys
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+import key_set
+
+from claims.parsing import (
+    VERB_POSITIONS,
+    ParsedQuery,
+    QueryTuple,
+    RawQuery,
+    extract_resource,
+    extract_trusted_verb_resource,
+    extract_verb_resource,
+    mask_verbs,
+    parse_query,
+    verb_mask,
+)
+
+# key of a claim sorting first on verb, then on resource (global first)
+SortKey = Callable[[Any], Tuple[str, str]]
+
+
+def check_claim(verb: str, resource: Optional[str], parsed: ParsedQuery) -> bool:
+    """Returns true if the claim with the given verb and resource includes the query."""
+    if verb != parsed.verb:
+        return False
+
+    if resource is None:
+        return True
+
+    query_resource = parsed.resource
+    if query_resource is None:
+        return False
+
+    if query_resource == resource:
+        return True
+
+    size = len(resource)
+    return (
+        len(query_resource) > size
+        and query_resource[size] == "."
+        and query_resource.startswith(resource)
+    )
+
+
+def direct_descendant(
+    verb: str, resource: Optional[str], parsed: ParsedQuery
+) -> Optional[str]:
+    """Returns the segment of the claim resource right below the query, if the claim is below it (same verb)."""
+    if resource is None or verb != parsed.verb:
+        return None
+
+    # the segment right after the prefix, without splitting the whole resource
+    if parsed.prefix is None:
+        start = 0
+    elif resource.startswith(parsed.prefix):
+        start = len(parsed.prefix)
+    else:
+        return None
+    end = resource.find(".", start)
+    return resource[start:] if end == -1 else resource[start:end]
+
+
+def direct_child(
+    verb: str, resource: Optional[str], parsed: ParsedQuery
+) -> Optional[str]:
+    """Returns the last segment of the claim resource, if the claim is right below the query (same verb)."""
+    child = direct_descendant(verb, resource, parsed)
+    # a direct child only if that segment is the last one of the resource
+    if child is None or len(parsed.prefix or "") + len(child) != len(resource or ""):
+        return None
+    return child
+
+
+def checking_keys(parsed: ParsedQuery) -> Iterator[QueryTuple]:
+    """(verb, resource) of every claim that checks the query: the global one, and each prefix of the resource."""
+    yield parsed.verb, None
+    resource = parsed.resource
+    if resource is None:
+        return
+    idx = resource.find(".")
+    while idx != -1:
+        yield parsed.verb, resource[:idx]
+        idx = resource.find(".", idx + 1)
+    yield parsed.verb, resource
+
+
+def sort_key_of(key: QueryTuple) -> Tuple[str, str]:
+    """Same order as `CoreClaim.sort_key()`, for a (verb, resource)."""
+    return key[0], "" if key[1] is None else key[1]
+
+
+def find_claim(
+    claims: Sequence[Any], key: QueryTuple, sort_key: SortKey
+) -> Optional[int]:
+    """Position of the claim with the given (verb, resource) in the claims sorted by `sort_key`, if any."""
+    idx = bisect.bisect_left(claims, sort_key_of(key), key=sort_key)
+    if idx < len(claims):
+        claim = claims[idx]
+        if claim.verb == key[0] and claim.resource == key[1]:
+            return idx
+    return None
+
+
+def range_below(
+    claims: Sequence[Any], parsed: ParsedQuery, sort_key: SortKey
+) -> Tuple[int, int]:
+    """
+    Range in the claims sorted by `sort_key` that can be below the query: every claim
+    of the verb for a global query, or the ones starting with `resource.` otherwise.
+    """
+    if parsed.prefix is None:
+        lo_key = (parsed.verb, "")
+        # "\0" sorts before any other character, so this is right after the verb
+        hi_key = (f"{parsed.verb}\0", "")
+    else:
+        lo_key = (parsed.verb, parsed.prefix)
+        # "/" is the character right after ".", closing the `resource.` range
+        hi_key = (parsed.verb, f"{parsed.resource}/")
+    lo = bisect.bisect_left(claims, lo_key, key=sort_key)
+    hi = bisect.bisect_left(claims, hi_key, lo=lo, key=sort_key)
+    return lo, hi
+
+
+class CoreClaim:
+    """
+    Compact and immutable claim: `verb:resource` or `verb:*` (resource None).
+
+    Verb and resource are interned, so equal claims share their strings.
+    """
+
+    __slots__ = ("verb", "resource")
+
+    verb: str
+    resource: Optional[str]
+
+    def __init__(self, verb: str, resource: Optional[str]):
+        """Expects an already validated verb and resource, use `build_core_claim()` otherwise."""
+        object.__setattr__(self, "verb", sys.intern(verb))
+        object.__setattr__(
+            self, "resource", None if resource is None else sys.intern(resource)
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Raises AttributeError: CoreClaim is immutable."""
+        raise AttributeError(f"CoreClaim is immutable, cannot set {name}")
+
+    def __reduce__(self) -> Tuple[type, QueryTuple]:
+        """Pickles as the verb and resource."""
+        return CoreClaim, (self.verb, self.resource)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compares verb and resource."""
+        if not isinstance(other, CoreClaim):
+            return NotImplemented
+        return self.verb == other.verb and self.resource == other.resource
+
+    def __hash__(self) -> int:
+        """Hashes verb and resource."""
+        return hash((self.verb, self.resource))
+
+    def __lt__(self, other: "CoreClaim") -> bool:
+        """Compares based first on verb, then on resource (same order as Claim)."""
+        return self.sort_key() < other.sort_key()
+
+    def __str__(self) -> str:
+        """Returns `VERB:*` if global or `VERB:RESOURCE otherwise."""
+        suffix = "*" if self.resource is None else self.resource
+        return f"{self.verb}:{suffix}"
+
+    def __repr__(self) -> str:
+        """Returns `CoreClaim('VERB:RESOURCE')`."""
+        return f"CoreClaim({str(self)!r})"
+
+    def sort_key(self) -> Tuple[str, str]:
+        """Key sorting first on verb, then on resource (global first)."""
+        return self.verb, "" if self.resource is None else self.resource
+
+    def check(self, query: RawQuery) -> bool:
+        """Returns true if this claim includes the given query."""
+        return check_claim(self.verb, self.resource, parse_query(query))
+
+    def direct_child_of(self, query: RawQuery) -> Optional[str]:
+        """
+        Given a query, if this claim is a direct child of that query,
+        it will return the immediate child part, otherwise it returns None
+        (same as `Claim.direct_child_of()`).
+        """
+        return direct_child(self.verb, self.resource, parse_query(query))
+
+    def direct_descendant_of(self, query: RawQuery) -> Optional[str]:
+        """
+        Given a query, if this claim is a direct descendant of that query,
+        it will return the immediate child part, otherwise it returns None
+        (same as `Claim.direct_descendant_of()`).
+        """
+        return direct_descendant(self.verb, self.resource, parse_query(query))
+
+
+class CoreClaimSet:
+    """Compact and immutable set of claims, kept as a sorted tuple of unique CoreClaims."""
+
+    __slots__ = ("claims",)
+
+    claims: Tuple[CoreClaim, ...]
+
+    def __init__(self, claims: Iterable[CoreClaim] = ()):
+        """Sorts and removes duplicates from the given claims."""
+        unique: Dict[QueryTuple, CoreClaim] = {}
+        for claim in claims:
+            unique.setdefault((claim.verb, claim.resource), claim)
+        object.__setattr__(
+            self, "claims", tuple(sorted(unique.values(), key=CoreClaim.sort_key))
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Raises AttributeError: CoreClaimSet is immutable."""
+        raise AttributeError(f"CoreClaimSet is immutable, cannot set {name}")
+
+    def __reduce__(self) -> Tuple[type, Tuple[Tuple[CoreClaim, ...]]]:
+        """Pickles as the tuple of claims."""
+        return CoreClaimSet, (self.claims,)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compares the claims."""
+        if not isinstance(other, CoreClaimSet):
+            return NotImplemented
+        return self.claims == other.claims
+
+    def __hash__(self) -> int:
+        """Hashes the claims."""
+        return hash(self.claims)
+
+    def __len__(self) -> int:
+        """Number of claims."""
+        return len(self.claims)
+
+    def __iter__(self) -> Iterator[CoreClaim]:
+        """Iterates over the sorted claims."""
+        return iter(self.claims)
+
+    def __repr__(self) -> str:
+        """Returns `CoreClaimSet([...])`."""
+        return f"CoreClaimSet({[str(c) for c in self.claims]!r})"
+
+    def check(self, query: RawQuery) -> bool:
+        """Returns True if any of the claims checks for the given query."""
+        parsed = parse_query(query)
+        return any(self._find(key) is not None for key in checking_keys(parsed))
+
+    def check_many(self, queries: Sequence[RawQuery]) -> List[bool]:
+        """Same as `check()` for each of the queries, returning the results in the same order."""
+        return [self.check(q) for q in queries]
+
+    def has_exact(self, query: RawQuery) -> bool:
+        """Returns True if the query is checked in the claims."""
+        parsed = parse_query(query)
+        return self._find((parsed.verb, parsed.resource)) is not None
+
+    def checked_verbs(self, resource: Optional[str]) -> List[str]:
+        """
+        Returns the verbs for which the claims check the given resource (None for
+        global), in the order of ALLOWED_VERBS.
+        """
+        return mask_verbs(self.checked_verb_mask(resource))
+
+    def checked_verb_mask(self, resource: Optional[str]) -> int:
+        """Same as `checked_verbs()`, as a verb mask (see `verb_mask()`)."""
+        resource = extract_resource(resource)
+        checking: Set[Optional[str]] = {None}
+        if resource is not None:
+            idx = resource.find(".")
+            while idx != -1:
+                checking.add(resource[:idx])
+                idx = resource.find(".", idx + 1)
+            checking.add(resource)
+
+        mask = 0
+        for verb, position in VERB_POSITIONS.items():
+            if any(self._find((verb, r)) is not None for r in checking):
+                mask |= 1 << position
+        return mask
+
+    def direct_children_of(self, query: RawQuery) -> List[str]:
+        """Collects from the claims the result of `direct_child_of()`, without Nones."""
+        return self._below(parse_query(query), direct_child)
+
+    def direct_descendants_of(self, query: RawQuery) -> List[str]:
+        """Collects from the claims the result of `direct_descendant_of()`, without Nones."""
+        return self._below(parse_query(query), direct_descendant)
+
+    def _find(self, key: QueryTuple) -> Optional[int]:
+        return find_claim(self.claims, key, CoreClaim.sort_key)
+
+    def _below(
+        self,
+        parsed: ParsedQuery,
+        child_for: Callable[[str, Optional[str], ParsedQuery], Optional[str]],
+    ) -> List[str]:
+        children: Set[str] = set()
+        lo, hi = range_below(self.claims, parsed, CoreClaim.sort_key)
+        for claim in self.claims[lo:hi]:
+            child = child_for(claim.verb, claim.resource, parsed)
+            if child is not None:
+                children.add(child)
+        return sorted(children)
+
+
+class CoreAbility:
+    """Compact and immutable ability with permitted and prohibited CoreClaimSets."""
+
+    __slots__ = ("permitted", "prohibited")
+
+    permitted: CoreClaimSet
+    prohibited: CoreClaimSet
+
+    def __init__(self, permitted: CoreClaimSet, prohibited: CoreClaimSet):
+        """Builds the ability from the given claim sets."""
+        object.__setattr__(self, "permitted", permitted)
+        object.__setattr__(self, "prohibited", prohibited)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Raises AttributeError: CoreAbility is immutable."""
+        raise AttributeError(f"CoreAbility is immutable, cannot set {name}")
+
+    def __reduce__(self) -> Tuple[type, Tuple[CoreClaimSet, CoreClaimSet]]:
+        """Pickles as the permitted and prohibited claim sets."""
+        return CoreAbility, (self.permitted, self.prohibited)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compares permitted and prohibited."""
+        if not isinstance(other, CoreAbility):
+            return NotImplemented
+        return self.permitted == other.permitted and self.prohibited == other.prohibited
+
+    def __hash__(self) -> int:
+        """Hashes permitted and prohibited."""
+        return hash((self.permitted, self.prohibited))
+
+    def __repr__(self) -> str:
+        """Returns `CoreAbility(permitted=..., prohibited=...)`."""
+        return (
+            f"CoreAbility(permitted={self.permitted!r}, prohibited={self.prohibited!r})"
+        )
+
+    def can(self, query: RawQuery) -> bool:
+        """Returns true if a permitted claim checks, and no prohibited claim check."""
+        parsed = parse_query(query)
+        return self.permitted.check(parsed) and not self.prohibited.check(parsed)
+
+    def can_many(self, queries: Sequence[RawQuery]) -> List[bool]:
+        """Same as `can()` for each of the queries, returning the results in the same order."""
+        return [self.can(q) for q in queries]
+
+    def cannot(self, query: RawQuery) -> bool:
+        """Inverse of can."""
+        return not self.can(query)
+
+    def allowed_verbs(self, resource: Optional[str]) -> List[str]:
+        """
+        Returns the verbs for which `can()` the given resource (None for global):
+        permitted and not prohibited, in the order of ALLOWED_VERBS.
+        """
+        return mask_verbs(self._allowed_mask(resource))
+
+    def can_any(self, verbs: Iterable[str], resource: Optional[str]) -> bool:
+        """Returns true if `can()` the given resource with any of the verbs (see `allowed_verbs()`)."""
+        return bool(verb_mask(verbs) & self._allowed_mask(resource))
+
+    def can_all(self, verbs: Iterable[str], resource: Optional[str]) -> bool:
+        """Returns true if `can()` the given resource with every one of the verbs (see `allowed_verbs()`)."""
+        mask = verb_mask(verbs)
+        return self._allowed_mask(resource) & mask == mask
+
+    def _allowed_mask(self, resource: Optional[str]) -> int:
+        permitted = self.permitted.checked_verb_mask(resource)
+        if not permitted:
+            return 0
+        return permitted & ~self.prohibited.checked_verb_mask(resource)
+
+    def is_explicitly_prohibited(self, query: RawQuery) -> bool:
+        """Returns true if a prohibited claim checks, regardless of permitted."""
+        return self.prohibited.check(query)
+
+    def access_to_resources(self, query: RawQuery) -> key_set.KeySet:
+        """
+        Returns a KeySet describing the access of this ability to the
+        children of the given query:
+        Allows on direct descendants, forbids on direct children
+        """
+        parsed = parse_query(query)
+        allowed = (
+            key_set.build_all()
+            if self.permitted.check(parsed)
+            else key_set.build_some_or_none(
+                self.permitted.direct_descendants_of(parsed)
+            )
+        )
+        forbidden = (
+            key_set.build_all()
+            if self.prohibited.check(parsed)
+            else key_set.build_some_or_none(self.prohibited.direct_children_of(parsed))
+        )
+        return allowed.difference(forbidden)
+
+
+RawCoreClaim = Union[CoreClaim, RawQuery]
+
+
+def build_core_claim(raw: RawCoreClaim, trusted: bool = False) -> CoreClaim:
+    """
+    Parses the raw query and builds a CoreClaim with it.
+
+    If `trusted` is True, the raw query is not validated (see `extract_trusted_verb_resource()`).
+    """
+    if isinstance(raw, CoreClaim):
+        return raw
+    if trusted:
+        return CoreClaim(*extract_trusted_verb_resource(raw))
+    return CoreClaim(*extract_verb_resource(raw))
+
+
+def build_core_claim_set(
+    raw_list: Iterable[RawCoreClaim], trusted: bool = False
+) -> CoreClaimSet:
+    """Parses the raw claims and builds a CoreClaimSet with them."""
+    if isinstance(raw_list, CoreClaimSet):
+        return raw_list
+    extract = extract_trusted_verb_resource if trusted else extract_verb_resource
+    # duplicates removed before building any CoreClaim
+    unique: Dict[QueryTuple, Optional[CoreClaim]] = {}
+    for raw in raw_list:
+        if isinstance(raw, CoreClaim):
+            unique.setdefault((raw.verb, raw.resource), raw)
+        else:
+            unique.setdefault(extract(raw), None)
+    return CoreClaimSet(
+        CoreClaim(*key) if claim is None else claim for key, claim in unique.items()
+    )
+
+
+def build_core_ability(
+    permitted: Iterable[RawCoreClaim],
+    prohibited: Iterable[RawCoreClaim],
+    trusted: bool = False,
+) -> CoreAbility:
+    """Builds a CoreAbility from the 2 lists of raw claims: permitted and prohibited."""
+    return CoreAbility(
+        build_core_claim_set(permitted, trusted),
+        build_core_claim_set(prohibited, trusted),
+    )
@@ -0,0 +1,289 @@
+"""ClaimIndex object, a segment trie over a list of claims."""
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from claims.claim import Claim
+from claims.parsing import VERB_POSITIONS
+
+# flags stored on the trie nodes, a plain index only uses `MATCH`
+MATCH = 1
+PERMITTED = 1
+PROHIBITED = 2
+
+# bits of the flags of each verb in the node masks: the flags of the verb at
+# position `p` (see `VERB_POSITIONS`) are `flags << (FLAG_WIDTH * p)`
+FLAG_WIDTH = 2
+_FLAGS = (1 << FLAG_WIDTH) - 1
+
+# shift of the flags of each verb in the node masks: the allowed verbs first,
+# then any other verb met (e.g. in trusted claims) after them
+_shifts: Dict[str, int] = {
+    verb: FLAG_WIDTH * position for verb, position in VERB_POSITIONS.items()
+}
+_shifts_lock = threading.Lock()
+
+
+def _shift(verb: str) -> int:
+    shift = _shifts.get(verb)
+    if shift is None:
+        with _shifts_lock:
+            shift = _shifts.setdefault(verb, FLAG_WIDTH * len(_shifts))
+    return shift
+
+
+def verb_bits(verb: str, flags: int) -> int:
+    """Bits of the given flags of the verb in the node masks."""
+    shift = _shifts.get(verb)
+    return flags << (_shift(verb) if shift is None else shift)
+
+
+def flags_of(bits: int, verb: str) -> int:
+    """Flags of the verb in the given node mask bits."""
+    shift = _shifts.get(verb)
+    return bits >> (_shift(verb) if shift is None else shift) & _FLAGS
+
+
+def verb_mask_of(bits: int, flag: int) -> int:
+    """Verb mask (see `VERB_POSITIONS`) of the allowed verbs with the flag set in the given node mask bits."""
+    mask = 0
+    for position in VERB_POSITIONS.values():
+        if bits >> (FLAG_WIDTH * position) & flag:
+            mask |= 1 << position
+    return mask
+
+
+def verbs_with(bits: int, flag: int) -> List[str]:
+    """Verbs with the flag set in the given node mask bits, allowed verbs first (in order)."""
+    return [verb for verb, shift in _shifts.items() if bits >> shift & flag]
+
+
+class _Node:
+    """One dotted segment of a claim resource in the trie."""
+
+    __slots__ = ("children", "flags", "below")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        # verb flags of the claims ending exactly on this node
+        self.flags = 0
+        # verb flags of the claims ending on any node below this one
+        self.below = 0
+
+    def copy(self) -> "_Node":
+        """Shallow copy: the children are shared with this node."""
+        node = _Node()
+        node.children = dict(self.children)
+        node.flags = self.flags
+        node.below = self.below
+        return node
+
+
+class ClaimIndex:
+    """
+    Segment trie built from a list of claims, shared by every verb.
+
+    The root node stands for the global claims (`verb:*`) and each level below
+    it for one dotted segment of the resource. Each node keeps a mask with the
+    flags of each verb whose claims end exactly there (see `verb_bits()`), so a
+    check only walks the segments of the query instead of scanning every claim,
+    and claims on the same resource with different verbs share their nodes: the
+    verbs checking a resource are the union of the masks on its path.
+
+    Claims from different sources can be stored in the same trie with
+    different flags (e.g. `PERMITTED` and `PROHIBITED`).
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, claims: Iterable[Claim] = (), flag: int = MATCH):
+        """Builds the trie from the given claims, flagging them with `flag`."""
+        self._root = _Node()
+        self.add(claims, flag)
+
+    def add(self, claims: Iterable[Claim], flag: int) -> None:
+        """Adds the given claims to the trie, flagging them with `flag`. Meant to be used only while building."""
+        for claim in claims:
+            self._insert(claim.verb, claim.resource, flag)
+
+    def with_claims(self, claims: Iterable[Claim], flag: int = MATCH) -> "ClaimIndex":
+        """
+        Returns a new index with the given claims added, leaving this one untouched.
+
+        Only the nodes on the path of each added claim are copied, the rest of
+        the trie is shared with this index.
+        """
+        derived = ClaimIndex()
+        derived._root = self._root
+        # ids of the nodes owned by the derived index, which can be changed in place
+        owned: Set[int] = set()
+        for claim in claims:
+            derived._insert(claim.verb, claim.resource, flag, owned)
+        return derived
+
+    def without_claims(
+        self, claims: Iterable[Claim], flag: int = MATCH
+    ) -> "ClaimIndex":
+        """
+        Returns a new index with the given claims removed, leaving this one untouched.
+
+        Only the nodes on the path of each removed claim are copied, the rest of
+        the trie is shared with this index.
+        """
+        derived = ClaimIndex()
+        derived._root = self._root
+        owned: Set[int] = set()
+        for claim in claims:
+            derived._remove(claim.verb, claim.resource, flag, owned)
+        return derived
+
+    def _remove(
+        self, verb: str, resource: Optional[str], flag: int, owned: Set[int]
+    ) -> None:
+        segments = () if resource is None else tuple(resource.split("."))
+        if not self.has_exact(verb, segments, flag):
+            return
+
+        nodes = [self._own_root(owned)]
+        for segment in segments:
+            nodes.append(self._own(nodes[-1].children, segment, owned))
+        nodes[-1].flags &= ~verb_bits(verb, flag)
+
+        # going up, drop the nodes left empty and recompute what is below each parent
+        for depth in range(len(segments), 0, -1):
+            node, parent = nodes[depth], nodes[depth - 1]
+            if not node.flags and not node.children:
+                del parent.children[segments[depth - 1]]
+            parent.below = 0
+            for child in parent.children.values():
+                parent.below |= child.flags | child.below
+
+    def _insert(
+        self,
+        verb: str,
+        resource: Optional[str],
+        flag: int,
+        owned: Optional[Set[int]] = None,
+    ) -> None:
+        bits = verb_bits(verb, flag)
+        node = self._own_root(owned)
+        if resource is not None:
+            for segment in resource.split("."):
+                node.below |= bits
+                node = self._own(node.children, segment, owned)
+        node.flags |= bits
+
+    def _own_root(self, owned: Optional[Set[int]]) -> _Node:
+        """Returns the root node, copying it if shared (`owned` given)."""
+        if owned is not None and id(self._root) not in owned:
+            self._root = self._root.copy()
+            owned.add(id(self._root))
+        return self._root
+
+    @staticmethod
+    def _own(nodes: Dict[str, _Node], key: str, owned: Optional[Set[int]]) -> _Node:
+        """Returns the node for the key, creating it, or copying it if shared (`owned` given)."""
+        node = nodes.get(key)
+        if node is None:
+            node = nodes[key] = _Node()
+            if owned is not None:
+                owned.add(id(node))
+        elif owned is not None and id(node) not in owned:
+            node = nodes[key] = node.copy()
+            owned.add(id(node))
+        return node
+
+    def verbs(self) -> List[str]:
+        """Returns the verbs with at least one claim in the index."""
+        return verbs_with(self._root.flags | self._root.below, _FLAGS)
+
+    def verb_flags(self, verb: str) -> Tuple[int, int]:
+        """Returns the flags of the global claim of the verb, and the flags of every claim of the verb."""
+        root = self._root
+        return flags_of(root.flags, verb), flags_of(root.flags | root.below, verb)
+
+    def check(self, verb: str, segments: Sequence[str], flag: int = MATCH) -> bool:
+        """
+        Returns True if any of the claims flagged with `flag` checks the given
+        verb and resource segments (empty for a global query).
+        """
+        shift = _shifts.get(verb)
+        bits = flag << (_shift(verb) if shift is None else shift)
+        node = self._root
+        if node.flags & bits:
+            return True
+        if not node.below & bits:
+            return False
+        for segment in segments:
+            next_node = node.children.get(segment)
+            if next_node is None:
+                return False
+            if next_node.flags & bits:
+                return True
+            node = next_node
+        return False
+
+    def has_exact(self, verb: str, segments: Sequence[str], flag: int = MATCH) -> bool:
+        """Returns True if a claim flagged with `flag` has exactly the given verb and resource segments."""
+        node: Optional[_Node] = self._root
+        for segment in segments:
+            if node is None:
+                return False
+            node = node.children.get(segment)
+        return node is not None and bool(node.flags & verb_bits(verb, flag))
+
+    def walk(self, verb: str, segments: Sequence[str]) -> Tuple[int, Optional[_Node]]:
+        """
+        Walks the given verb and resource segments (empty for a global query).
+
+        Returns the union of the flags of every claim of the verb that checks it,
+        and the node of the resource itself (None if no claim of the verb reaches
+        that deep).
+        """
+        mask = verb_bits(verb, _FLAGS)
+        node = self._root
+        bits = node.flags
+        if not (bits | node.below) & mask:
+            return 0, None
+        for segment in segments:
+            next_node = node.children.get(segment)
+            if next_node is None or not (next_node.flags | next_node.below) & mask:
+                return flags_of(bits, verb), None
+            bits |= next_node.flags
+            node = next_node
+        return flags_of(bits, verb), node
+
+    def walk_all(self, segments: Sequence[str]) -> Tuple[int, Optional[_Node]]:
+        """
+        Walks the given resource segments (empty for a global query), for every verb at once.
+
+        Returns the union of the masks of every claim that checks it, whatever its
+        verb (see `flags_of()` and `verbs_with()`), and the node of the resource
+        itself (None if no claim reaches that deep).
+        """
+        node = self._root
+        bits = node.flags
+        for segment in segments:
+            next_node = node.children.get(segment)
+            if next_node is None:
+                return bits, None
+            bits |= next_node.flags
+            node = next_node
+        return bits, node
+
+
+def direct_children(node: Optional[_Node], verb: str, flag: int) -> List[str]:
+    """Returns the segments right below the node where a claim of the verb flagged with `flag` ends."""
+    if node is None:
+        return []
+    bits = verb_bits(verb, flag)
+    return [s for s, child in node.children.items() if child.flags & bits]
+
+
+def direct_descendants(node: Optional[_Node], verb: str, flag: int) -> List[str]:
+    """Returns the segments right below the node where a claim of the verb flagged with `flag` ends or passes through."""
+    bits = verb_bits(verb, flag)
+    if node is None or not node.below & bits:
+        return []
+    return [
+        s for s, child in node.children.items() if (child.flags | child.below) & bits
+    ]
@@ -0,0 +1,237 @@
+"""Streaming loaders of claim sets and abilities from JSONL or CSV exports."""
+import contextlib
+import csv
+import json
+import os
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from claims.ability import Ability, build_ability
+from claims.claim_set import ClaimSet, build_claim_set
+from claims.errors import (
+    InvalidClaimError,
+    InvalidClaimResourceError,
+    InvalidClaimVerbError,
+)
+from claims.parsing import QueryTuple, RawQuery, extract_verb_resource
+
+Source = Union[str, "os.PathLike[str]", IO[str]]
+
+# raw claims of a record, for each kind ("claims", or "permitted" and "prohibited")
+_Record = Tuple[int, Hashable, Dict[str, List[Any]]]
+
+_CLAIM_ERRORS = (InvalidClaimError, InvalidClaimVerbError, InvalidClaimResourceError)
+
+
+class LoadError(NamedTuple):
+    """A malformed record (`claim` None) or claim, with its line in the source."""
+
+    line: int
+    principal: Optional[Hashable]
+    claim: Any
+    error_type: str
+    message: str
+
+
+class LoadReport:
+    """
+    Counters and errors of a load. Malformed records and claims are skipped and
+    reported here, keeping only the first `max_errors` of them to bound the memory.
+    """
+
+    def __init__(self, max_errors: int = 1000):
+        """Creates an empty report."""
+        self.max_errors = max_errors
+        self.errors: List[LoadError] = []
+        self.error_count = 0
+        self.records = 0
+        self.principals = 0
+        self.claims = 0
+
+    def __repr__(self) -> str:
+        """Returns the counters."""
+        return (
+            f"LoadReport(records={self.records}, principals={self.principals}, "
+            f"claims={self.claims}, error_count={self.error_count})"
+        )
+
+    def add_error(
+        self,
+        line: int,
+        principal: Optional[Hashable],
+        claim: Any,
+        error: Exception,
+    ) -> None:
+        """Counts the error, and keeps it if there are fewer than `max_errors`."""
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(
+                LoadError(line, principal, claim, type(error).__name__, str(error))
+            )
+
+
+def load_claim_sets(
+    source: Source,
+    file_format: str = "jsonl",
+    report: Optional[LoadReport] = None,
+    principal_field: str = "principal",
+) -> Iterator[Tuple[Hashable, ClaimSet]]:
+    """
+    Reads the source (a path or a text stream) lazily, yielding `(principal, ClaimSet)`.
+
+    - `jsonl`: one object per line, `{"principal": "u1", "claims": ["read:*", ...]}`
+    - `csv`: one claim per row, with `principal` and `claim` columns
+
+    Consecutive records of the same principal are merged into one ClaimSet, so only
+    one principal is kept in memory: the source is expected to be grouped by principal.
+    Malformed records and claims are skipped and collected in the `report`.
+    """
+    for principal, claims in _load(
+        source, file_format, ("claims",), report, principal_field
+    ):
+        yield principal, build_claim_set(claims["claims"], trusted=True)
+
+
+def load_abilities(
+    source: Source,
+    file_format: str = "jsonl",
+    report: Optional[LoadReport] = None,
+    principal_field: str = "principal",
+) -> Iterator[Tuple[Hashable, Ability]]:
+    """
+    Reads the source (a path or a text stream) lazily, yielding `(principal, Ability)`.
+
+    - `jsonl`: one object per line, `{"principal": "u1", "permitted": [...], "prohibited": [...]}`
+    - `csv`: one claim per row, with `principal`, `claim` and `kind` (`permitted` or `prohibited`) columns
+
+    Same as `load_claim_sets()` otherwise.
+    """
+    for principal, claims in _load(
+        source, file_format, ("permitted", "prohibited"), report, principal_field
+    ):
+        yield principal, build_ability(
+            claims["permitted"], claims["prohibited"], trusted=True
+        )
+
+
+def _load(
+    source: Source,
+    file_format: str,
+    kinds: Sequence[str],
+    report: Optional[LoadReport],
+    principal_field: str,
+) -> Iterator[Tuple[Hashable, Dict[str, List[QueryTuple]]]]:
+    """Validated (verb, resource) of each principal, for each kind."""
+    if file_format not in ("jsonl", "csv"):
+        raise ValueError(f"unsupported format: {file_format}")
+    if report is None:
+        report = LoadReport()
+
+    with _open(source) as stream:
+        records = (
+            _read_jsonl(stream, kinds, principal_field, report)
+            if file_format == "jsonl"
+            else _read_csv(stream, kinds, principal_field, report)
+        )
+
+        current: Optional[Hashable] = None
+        # a dict per kind, to keep the order while removing duplicates
+        claims: Optional[Dict[str, Dict[QueryTuple, None]]] = None
+        for line, principal, raw_claims in records:
+            report.records += 1
+            if claims is None or principal != current:
+                if claims is not None:
+                    report.principals += 1
+                    yield current, {k: list(v) for k, v in claims.items()}
+                current = principal
+                claims = {kind: {} for kind in kinds}
+
+            for kind, raws in raw_claims.items():
+                for raw in raws:
+                    report.claims += 1
+                    try:
+                        claims[kind][extract_verb_resource(_as_query(raw))] = None
+                    except _CLAIM_ERRORS as error:
+                        report.add_error(line, principal, raw, error)
+
+        if claims is not None:
+            report.principals += 1
+            yield current, {k: list(v) for k, v in claims.items()}
+
+
+def _open(source: Source) -> contextlib.AbstractContextManager:
+    if hasattr(source, "read"):
+        return contextlib.nullcontext(source)
+    return open(source, newline="", encoding="utf-8")
+
+
+def _as_query(raw: Any) -> RawQuery:
+    """Raw claims as read from JSON: strings, `{"verb", "resource"}` objects or `[verb, resource]` lists."""
+    if isinstance(raw, (str, dict)):
+        return raw  # type: ignore[return-value]
+    if isinstance(raw, (list, tuple)) and len(raw) == 2:
+        return raw[0], raw[1]
+    raise InvalidClaimError(raw)
+
+
+def _read_jsonl(
+    stream: IO[str], kinds: Sequence[str], principal_field: str, report: LoadReport
+) -> Iterator[_Record]:
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        principal: Optional[Hashable] = None
+        try:
+            data = json.loads(text)
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+            principal = _principal(data, principal_field)
+            raw_claims = {kind: data.get(kind, []) for kind in kinds}
+            for kind, raws in raw_claims.items():
+                if not isinstance(raws, list):
+                    raise ValueError(f"{kind} should be a list")
+        except ValueError as error:
+            report.add_error(line, principal, None, error)
+            continue
+        yield line, principal, raw_claims
+
+
+def _read_csv(
+    stream: IO[str], kinds: Sequence[str], principal_field: str, report: LoadReport
+) -> Iterator[_Record]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        line = reader.line_num
+        principal: Optional[Hashable] = None
+        try:
+            principal = _principal(row, principal_field)
+            claim = row.get("claim")
+            if not claim:
+                raise ValueError("missing claim")
+            kind = "claims" if kinds == ("claims",) else row.get("kind")
+            if kind is None or kind not in kinds:
+                raise ValueError(f"kind should be one of {', '.join(kinds)}: {kind}")
+        except ValueError as error:
+            report.add_error(line, principal, None, error)
+            continue
+        yield line, principal, {kind: [claim]}
+
+
+def _principal(data: Dict[str, Any], principal_field: str) -> Hashable:
+    principal = data.get(principal_field)
+    if principal is None or principal == "":
+        raise ValueError(f"missing {principal_field}")
+    if not isinstance(principal, (str, int)):
+        raise ValueError(f"{principal_field} should be a string or an integer")
+    return principal
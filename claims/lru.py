@@ -0,0 +1,77 @@
+"""LRUCache object, the size-bounded LRU mapping behind the parse cache and the decision memos."""
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, NamedTuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUStats(NamedTuple):
+    """Counters of an LRUCache, use `_asdict()` to export them."""
+
+    size: int
+    capacity: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Ratio of lookups served from the cache (0.0 if there were none)."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Thread-safe, size-bounded LRU cache, evicting the least recently used entry
+    once it holds more than `capacity` of them.
+
+    Values are computed outside of the lock, so two threads missing the same key
+    may both compute it: the last one stored wins.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """Creates an empty cache holding up to `capacity` entries."""
+        if capacity < 1:
+            raise ValueError(f"capacity should be a positive integer: {capacity}")
+        self.capacity = capacity
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_compute(self, key: K, compute: Callable[[], V]) -> V:
+        """Returns the cached value of the key, calling `compute` and storing its result on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return value
+
+    def clear(self) -> None:
+        """Removes every entry from the cache. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> LRUStats:
+        """Returns the current size and counters of the cache."""
+        with self._lock:
+            return LRUStats(
+                size=len(self._entries),
+                capacity=self.capacity,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+            )
@@ -0,0 +1,114 @@
+"""
+AbilityMatrix object, evaluating many queries against many abilities at once.
+
+Requires numpy, an optional dependency: `pip install claims[numpy]`.
+"""
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple
+
+from claims.core import checking_keys
+from claims.parsing import QueryTuple, RawQuery, parse_query
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+
+    from claims.ability import Ability
+
+
+def _import_numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as error:  # pragma: no cover
+        raise ImportError(
+            "AbilityMatrix requires numpy, install it with `pip install claims[numpy]`"
+        ) from error
+    return numpy
+
+
+class _Holders:
+    """For each claim id, the sorted positions of the abilities holding it (CSR arrays)."""
+
+    __slots__ = ("indptr", "indices")
+
+    def __init__(self, np: Any, pairs: List[Tuple[int, int]], key_count: int):
+        """Builds the arrays from the (claim id, ability position) pairs."""
+        claim_ids = np.fromiter((k for k, _ in pairs), dtype=np.int64, count=len(pairs))
+        positions = np.fromiter((u for _, u in pairs), dtype=np.int64, count=len(pairs))
+        order = np.argsort(claim_ids, kind="stable")
+        self.indices: "np.ndarray" = positions[order]
+        self.indptr: "np.ndarray" = np.zeros(key_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(claim_ids, minlength=key_count), out=self.indptr[1:])
+
+    def fill(
+        self, np: Any, touched: Dict[int, List[int]], shape: Tuple[int, int]
+    ) -> "np.ndarray":
+        """Boolean (abilities, queries) matrix, True where the ability holds a claim checking the query."""
+        result = np.zeros(shape, dtype=bool)
+        for claim_id, queries in touched.items():
+            holders = self.indices[self.indptr[claim_id] : self.indptr[claim_id + 1]]
+            if len(holders):
+                result[np.ix_(holders, np.asarray(queries))] = True
+        return result
+
+
+class AbilityMatrix:
+    """
+    Immutable encoding of many abilities to evaluate batches of queries against all of them.
+
+    Every distinct claim (verb and resource) gets an integer id, and each claim id
+    keeps the positions of the abilities holding it as permitted or prohibited in
+    numpy arrays. A query only looks up the ids of the claims that could check it
+    (the global claim of its verb and each prefix of its resource), so the cost
+    depends on the queries and on who holds those claims, not on `abilities × queries`
+    calls to `Ability.can`.
+    """
+
+    __slots__ = ("_size", "_claim_ids", "_permitted", "_prohibited")
+
+    def __init__(self, abilities: Sequence["Ability"]):
+        """Encodes the given abilities, in order: row `i` of the results is `abilities[i]`."""
+        np = _import_numpy()
+        claim_ids: Dict[QueryTuple, int] = {}
+        permitted: List[Tuple[int, int]] = []
+        prohibited: List[Tuple[int, int]] = []
+        for position, ability in enumerate(abilities):
+            for claims, pairs in (
+                (ability.permitted.claims, permitted),
+                (ability.prohibited.claims, prohibited),
+            ):
+                for claim in claims:
+                    claim_id = claim_ids.setdefault(
+                        (claim.verb, claim.resource), len(claim_ids)
+                    )
+                    pairs.append((claim_id, position))
+
+        self._size = len(abilities)
+        self._claim_ids = claim_ids
+        self._permitted = _Holders(np, permitted, len(claim_ids))
+        self._prohibited = _Holders(np, prohibited, len(claim_ids))
+
+    def __len__(self) -> int:
+        """Number of abilities."""
+        return self._size
+
+    def can_many(self, queries: Sequence[RawQuery]) -> "np.ndarray":
+        """
+        Returns a boolean matrix of shape (abilities, queries): the cell `[i, j]` is
+        `abilities[i].can(queries[j])`.
+        """
+        np = _import_numpy()
+        # queries to check for each claim id that can check any of them
+        touched: Dict[int, List[int]] = {}
+        for position, query in enumerate(queries):
+            for key in checking_keys(parse_query(query)):
+                claim_id = self._claim_ids.get(key)
+                if claim_id is not None:
+                    touched.setdefault(claim_id, []).append(position)
+
+        shape = (self._size, len(queries))
+        permitted = self._permitted.fill(np, touched, shape)
+        prohibited = self._prohibited.fill(np, touched, shape)
+        return permitted & ~prohibited
+
+    def can(self, query: RawQuery) -> "np.ndarray":
+        """Returns a boolean vector with the decision of each ability for the query."""
+        return self.can_many([query])[:, 0]
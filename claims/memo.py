@@ -0,0 +1,27 @@
+"""DecisionMemo object, a size-bounded memo of the decisions of one Ability."""
+from typing import Any, Callable, Hashable, Tuple, TypeVar
+
+from claims.lru import LRUCache, LRUStats
+from claims.parsing import ParsedQuery
+
+T = TypeVar("T")
+
+# counters of a DecisionMemo, use `_asdict()` to export them
+DecisionMemoStats = LRUStats
+
+
+class DecisionMemo(LRUCache[Tuple[Hashable, ...], Any]):
+    """
+    Size-bounded LRU memo of decisions, keyed on the operation and the normalized
+    (already parsed) query, so `read:clients.*` and `("read", "clients")` share an entry.
+
+    Only valid for a single immutable Ability: its decisions never change.
+    """
+
+    def get(
+        self, operation: str, parsed: ParsedQuery, decide: Callable[[ParsedQuery], T]
+    ) -> T:
+        """Returns the memoized decision of the operation for the query, calling `decide` and storing its result on a miss."""
+        key = (operation, parsed.verb, parsed.resource)
+        result: T = self.get_or_compute(key, lambda: decide(parsed))
+        return result
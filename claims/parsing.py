@@ -1,13 +1,28 @@
 # -*- coding: utf-8 -*-
 """Utility functions."""
+import os
 import re
-from typing import Optional, Tuple, TypedDict, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    TypedDict,
+    Union,
+)
 
 from claims.errors import (
     InvalidClaimError,
     InvalidClaimResourceError,
     InvalidClaimVerbError,
 )
+from claims.lru import LRUCache, LRUStats
 
 
 class ClaimDict(TypedDict):
@@ -18,19 +33,199 @@ class ClaimDict(TypedDict):
 
 
 QueryTuple = Tuple[str, Optional[str]]
-RawQuery = Union[str, QueryTuple, ClaimDict]
+
+
+class ParsedQuery:
+    """
+    Immutable, already validated query. Build it with `parse_query()`.
+
+    Every Claim, ClaimSet and Ability method accepts it without validating it
+    again. It also unpacks like a QueryTuple: `verb, resource = parsed`.
+    """
+
+    __slots__ = ("verb", "resource", "segments", "prefix")
+
+    verb: str
+    resource: Optional[str]
+    segments: Tuple[str, ...]
+    prefix: Optional[str]
+
+    def __init__(self, verb: str, resource: Optional[str]):
+        """Expects an already validated verb and resource, use `parse_query()` instead."""
+        object.__setattr__(self, "verb", verb)
+        object.__setattr__(self, "resource", resource)
+        if resource is None:
+            object.__setattr__(self, "segments", ())
+            object.__setattr__(self, "prefix", None)
+        else:
+            object.__setattr__(self, "segments", tuple(resource.split(".")))
+            object.__setattr__(self, "prefix", f"{resource}.")
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Raises AttributeError: ParsedQuery is immutable."""
+        raise AttributeError(f"ParsedQuery is immutable, cannot set {name}")
+
+    def __reduce__(self) -> Tuple[type, QueryTuple]:
+        """Pickles as the verb and resource."""
+        return ParsedQuery, (self.verb, self.resource)
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        """Unpacks as `verb, resource`."""
+        yield self.verb
+        yield self.resource
+
+    def __eq__(self, other: Any) -> bool:
+        """Compares verb and resource."""
+        if not isinstance(other, ParsedQuery):
+            return NotImplemented
+        return self.verb == other.verb and self.resource == other.resource
+
+    def __hash__(self) -> int:
+        """Hashes verb and resource."""
+        return hash((self.verb, self.resource))
+
+    def __repr__(self) -> str:
+        """Returns `ParsedQuery(verb, resource)`."""
+        return f"ParsedQuery({self.verb!r}, {self.resource!r})"
+
+
+RawQuery = Union[str, QueryTuple, ClaimDict, ParsedQuery]
 
 
 # allows for the optional `.*` at the end, (ignored on Claim creation)
 CLAIM_REGEX = re.compile(r"^([\w_\-]+):([\w_.\-]+\w)(\.\*)?$")
 RESOURCE_REGEX = re.compile(r"^([\w_.\-]+\w)(\.\*)?$")
+# a single segment, valid as the last one of a resource
+SEGMENT_REGEX = re.compile(r"^[\w_\-]*\w$")
 
 # cater for `read: *` global claims
 GLOBAL_WILDCARD_CLAIM_REGEX = re.compile(r"^([\w_\-]+):\*$")
 
 
+ParseError = Union[InvalidClaimError, InvalidClaimVerbError, InvalidClaimResourceError]
+
+
+class _ParseFailure(NamedTuple):
+    """
+    A parse error kept in the cache as its type and the value it was raised for.
+
+    A new instance is raised on each lookup: a cached instance would keep the
+    traceback (and so the frames) of the last caller it was raised to.
+    """
+
+    error_type: Type[ParseError]
+    value: Any
+
+    @classmethod
+    def of(cls, error: ParseError) -> "_ParseFailure":
+        """Returns the failure of the given error."""
+        if isinstance(error, InvalidClaimVerbError):
+            return cls(type(error), error.verb)
+        if isinstance(error, InvalidClaimResourceError):
+            return cls(type(error), error.resource)
+        return cls(type(error), error.raw)
+
+
+# counters of a ParseCache, use `_asdict()` to export them
+ParseCacheStats = LRUStats
+
+
+class ParseCache(LRUCache[str, Union[ParsedQuery, _ParseFailure]]):
+    """
+    Size-bounded LRU cache of parsed raw strings, keyed on the raw string.
+
+    Errors raised when parsing are cached as well, and raised again (as a new
+    instance) on later lookups.
+    """
+
+    def get(self, raw: str, parse: Callable[[str], ParsedQuery]) -> ParsedQuery:
+        """Returns the cached result for the raw string, calling `parse` and storing its result on a miss."""
+        entry = self.get_or_compute(raw, lambda: _parse_or_failure(raw, parse))
+        if isinstance(entry, _ParseFailure):
+            raise entry.error_type(entry.value)
+        return entry
+
+
+def _parse_or_failure(
+    raw: str, parse: Callable[[str], ParsedQuery]
+) -> Union[ParsedQuery, _ParseFailure]:
+    try:
+        return parse(raw)
+    except (
+        InvalidClaimError,
+        InvalidClaimVerbError,
+        InvalidClaimResourceError,
+    ) as error:
+        return _ParseFailure.of(error)
+
+
+_parse_cache: Optional[ParseCache] = None
+
+
+def enable_parse_cache(capacity: int = 1024) -> ParseCache:
+    """
+    Enables the cache of parsed raw strings used by `extract_verb_resource`, replacing any previous one.
+
+    Returns the new cache, so its stats can be exported.
+    """
+    global _parse_cache
+    _parse_cache = ParseCache(capacity)
+    return _parse_cache
+
+
+def disable_parse_cache() -> None:
+    """Disables the cache of parsed raw strings (the default)."""
+    global _parse_cache
+    _parse_cache = None
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Returns the cache of parsed raw strings, if enabled."""
+    return _parse_cache
+
+
+# validate the trusted raw claims anyway, meant for debugging and tests
+_validate_trusted = os.environ.get("CLAIMS_VALIDATE_TRUSTED", "") not in ("", "0")
+
+
+def enable_trusted_validation() -> None:
+    """
+    Validates the raw claims given as trusted (e.g. `build_claim_set(raw, trusted=True)`) as any other.
+
+    Also enabled by setting the `CLAIMS_VALIDATE_TRUSTED` environment variable (to anything but 0).
+    """
+    global _validate_trusted
+    _validate_trusted = True
+
+
+def disable_trusted_validation() -> None:
+    """Skips again the validation of the raw claims given as trusted (the default)."""
+    global _validate_trusted
+    _validate_trusted = False
+
+
+def is_trusted_validation_enabled() -> bool:
+    """Returns True if the raw claims given as trusted are validated anyway."""
+    return _validate_trusted
+
+
+def parse_query(raw: RawQuery) -> ParsedQuery:
+    """Returns a ParsedQuery from the raw query, which is returned as is if already parsed."""
+    if isinstance(raw, ParsedQuery):
+        return raw
+
+    cache = _parse_cache
+    if cache is not None and isinstance(raw, str):
+        return cache.get(raw, _parse_string_query)
+
+    return ParsedQuery(*extract_verb_resource(raw))
+
+
 def extract_verb_resource(raw: RawQuery) -> QueryTuple:
     """Returns a tuple with (verb, resource) from the raw string."""
+    if isinstance(raw, ParsedQuery):
+        return raw.verb, raw.resource
+
     if isinstance(raw, tuple):
         return _check_and_build(raw[0], raw[1])
 
@@ -42,6 +237,43 @@ def extract_verb_resource(raw: RawQuery) -> QueryTuple:
             raise InvalidClaimError(raw)
         return _check_and_build(verb, resource)
 
+    cache = _parse_cache
+    if cache is not None:
+        parsed = cache.get(raw, _parse_string_query)
+        return parsed.verb, parsed.resource
+    return _parse_string(raw)
+
+
+def extract_trusted_verb_resource(raw: RawQuery) -> QueryTuple:
+    """
+    Same as `extract_verb_resource()` for raw claims already validated elsewhere
+    (e.g. when stored), skipping the regex validation unless `enable_trusted_validation()`.
+    """
+    if _validate_trusted:
+        return extract_verb_resource(raw)
+
+    if isinstance(raw, str):
+        verb, _, resource = raw.partition(":")
+        if resource == "*":
+            return verb, None
+        if resource.endswith(".*"):
+            resource = resource[:-2]
+        return verb, resource or None
+
+    if isinstance(raw, ParsedQuery):
+        return raw.verb, raw.resource
+
+    if isinstance(raw, tuple):
+        return raw[0], raw[1] or None
+
+    return raw["verb"], raw["resource"] or None
+
+
+def _parse_string_query(raw: str) -> ParsedQuery:
+    return ParsedQuery(*_parse_string(raw))
+
+
+def _parse_string(raw: str) -> QueryTuple:
     global_match = GLOBAL_WILDCARD_CLAIM_REGEX.match(raw)
     if global_match:
         return _check_and_build(global_match.group(1), None)
@@ -54,11 +286,16 @@ def extract_verb_resource(raw: RawQuery) -> QueryTuple:
 
 
 def _check_and_build(verb: str, resource: Optional[str]) -> QueryTuple:
-    if verb not in ALLOWED_VERBS:
+    if not isinstance(verb, str) or verb not in VERB_POSITIONS:
         raise InvalidClaimVerbError(verb)
 
+    return verb, extract_resource(resource)
+
+
+def extract_resource(resource: Optional[str]) -> Optional[str]:
+    """Returns the resource validated on its own, as in a claim (None or empty if global)."""
     if not resource:
-        return verb, None
+        return None
 
     if not isinstance(resource, str):
         raise InvalidClaimResourceError(resource)
@@ -66,7 +303,28 @@ def _check_and_build(verb: str, resource: Optional[str]) -> QueryTuple:
     if not RESOURCE_REGEX.match(resource):
         raise InvalidClaimResourceError(resource)
 
-    return verb, resource
+    return resource
 
 
 ALLOWED_VERBS = ["admin", "read", "delete", "create", "update", "manage"]
+
+# position of each allowed verb in a verb mask: the verb is the bit `1 << position`
+VERB_POSITIONS: Dict[str, int] = {
+    verb: position for position, verb in enumerate(ALLOWED_VERBS)
+}
+
+
+def verb_mask(verbs: Iterable[str]) -> int:
+    """Returns the mask with the bit of each given verb. Raises InvalidClaimVerbError for an unknown verb."""
+    mask = 0
+    for verb in verbs:
+        position = VERB_POSITIONS.get(verb) if isinstance(verb, str) else None
+        if position is None:
+            raise InvalidClaimVerbError(verb)
+        mask |= 1 << position
+    return mask
+
+
+def mask_verbs(mask: int) -> List[str]:
+    """Returns the verbs of the mask, in the order of ALLOWED_VERBS."""
+    return [verb for verb, position in VERB_POSITIONS.items() if mask >> position & 1]
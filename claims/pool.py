@@ -0,0 +1,144 @@
+"""Opt-in interning pool, sharing one instance among the ClaimSets and Abilities with the same claims."""
+import threading
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from claims.parsing import QueryTuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from claims.ability import Ability
+    from claims.claim import Claim
+    from claims.claim_set import ClaimSet
+    from claims.core import CoreClaim
+
+ClaimSetKey = Tuple[QueryTuple, ...]
+
+
+def claim_set_key(claims: Iterable[Union["Claim", "CoreClaim"]]) -> ClaimSetKey:
+    """Canonical content of a ClaimSet: the (verb, resource) of its sorted claims."""
+    return tuple((c.verb, c.resource) for c in claims)
+
+
+class InternPoolStats(NamedTuple):
+    """Counters of an InternPool, use `_asdict()` to export them."""
+
+    claim_sets: int
+    abilities: int
+    hits: int
+    misses: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Ratio of lookups served from the pool (0.0 if there were none)."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class InternPool:
+    """
+    Pool of the ClaimSets (keyed on their claims) and Abilities (keyed on their
+    ClaimSets) in use, so the ones with the same content are one shared instance.
+
+    Instances are held by weak references: they leave the pool once nothing else uses them.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty pool."""
+        self._claim_sets: weakref.WeakValueDictionary[ClaimSetKey, "ClaimSet"] = (
+            weakref.WeakValueDictionary()
+        )
+        self._abilities: weakref.WeakValueDictionary[Tuple[int, int], "Ability"] = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def claim_set(
+        self, key: ClaimSetKey, build: Callable[[], "ClaimSet"]
+    ) -> "ClaimSet":
+        """Returns the pooled ClaimSet with the given key, calling `build` and pooling its result on a miss."""
+        with self._lock:
+            found = self._claim_sets.get(key)
+            if found is not None:
+                self._hits += 1
+                return found
+            self._misses += 1
+
+        built = build()
+        with self._lock:
+            return self._claim_sets.setdefault(key, built)
+
+    def ability(
+        self,
+        permitted: "ClaimSet",
+        prohibited: "ClaimSet",
+        build: Callable[[], "Ability"],
+    ) -> "Ability":
+        """
+        Returns the pooled Ability with exactly these ClaimSets, calling `build` and pooling its result on a miss.
+
+        The ClaimSets are expected to come from the pool already, so equal abilities share them.
+        """
+        # a pooled ability keeps its ClaimSets alive, so their ids are not reused meanwhile
+        key = (id(permitted), id(prohibited))
+        with self._lock:
+            found = self._abilities.get(key)
+            if found is not None:
+                self._hits += 1
+                return found
+            self._misses += 1
+
+        built = build()
+        with self._lock:
+            return self._abilities.setdefault(key, built)
+
+    def clear(self) -> None:
+        """Removes every instance from the pool. Counters are kept."""
+        with self._lock:
+            self._claim_sets.clear()
+            self._abilities.clear()
+
+    def stats(self) -> InternPoolStats:
+        """Returns the current size and counters of the pool."""
+        with self._lock:
+            return InternPoolStats(
+                claim_sets=len(self._claim_sets),
+                abilities=len(self._abilities),
+                hits=self._hits,
+                misses=self._misses,
+            )
+
+
+_intern_pool: Optional[InternPool] = None
+
+
+def enable_intern_pool() -> InternPool:
+    """
+    Enables the interning pool used by `build_claim_set`, `build_ability` and the
+    `with_*`/`without_*` methods, replacing any previous one.
+
+    Returns the new pool, so its stats can be exported.
+    """
+    global _intern_pool
+    _intern_pool = InternPool()
+    return _intern_pool
+
+
+def disable_intern_pool() -> None:
+    """Disables the interning pool (the default)."""
+    global _intern_pool
+    _intern_pool = None
+
+
+def get_intern_pool() -> Optional[InternPool]:
+    """Returns the interning pool, if enabled."""
+    return _intern_pool
@@ -0,0 +1,135 @@
+"""
+Compact binary encoding of claim sets, used by `to_bytes()` and pickling.
+
+Layout (version 1), all integers as unsigned LEB128 varints:
+
+    magic `CLMS` | version | kind | per claim set: flags, count, claims...
+
+Each claim is its verb id (position in `VERBS_V1`, shifted left once, with the
+lowest bit set for global claims) followed, if not global, by the length of
+the prefix shared with the previous resource, and the length and UTF-8 bytes
+of the rest. Claims are written in the sorted order of the ClaimSet, which is
+what makes the shared prefixes long.
+
+Decoding trusts the data: resources are not validated again.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+from claims.parsing import QueryTuple
+
+MAGIC = b"CLMS"
+VERSION = 1
+
+KIND_CLAIM_SET = 1
+KIND_ABILITY = 2
+
+# verb ids of version 1, never reorder: add new verbs at the end
+VERBS_V1 = ("admin", "read", "delete", "create", "update", "manage")
+_VERB_IDS = {verb: idx for idx, verb in enumerate(VERBS_V1)}
+
+# flags of each claim set
+FLAG_INDEXED = 1
+
+EncodedClaimSet = Tuple[List[QueryTuple], int]
+
+
+def dump(kind: int, claim_sets: Sequence[Tuple[Sequence[QueryTuple], int]]) -> bytes:
+    """Encodes the given (claims, flags) claim sets, claims given as sorted (verb, resource)."""
+    out = bytearray(MAGIC)
+    _write_varint(out, VERSION)
+    _write_varint(out, kind)
+    for claims, flags in claim_sets:
+        _write_varint(out, flags)
+        _write_varint(out, len(claims))
+        previous = b""
+        for verb, resource in claims:
+            try:
+                verb_id = _VERB_IDS[verb] << 1
+            except KeyError:
+                raise ValueError(f"verb cannot be encoded: {verb}")
+            if resource is None:
+                _write_varint(out, verb_id | 1)
+                continue
+            _write_varint(out, verb_id)
+            encoded = resource.encode("utf-8")
+            shared = _shared_prefix(previous, encoded)
+            _write_varint(out, shared)
+            _write_varint(out, len(encoded) - shared)
+            out += encoded[shared:]
+            previous = encoded
+    return bytes(out)
+
+
+def load(data: bytes, kind: int, count: int) -> List[EncodedClaimSet]:
+    """Decodes `count` claim sets as (claims, flags), checking magic, version and kind."""
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError("not an encoded claims payload")
+    pos = len(MAGIC)
+    version, pos = _read_varint(data, pos)
+    if version != VERSION:
+        raise ValueError(f"unsupported claims payload version: {version}")
+    data_kind, pos = _read_varint(data, pos)
+    if data_kind != kind:
+        raise ValueError(f"unexpected claims payload kind: {data_kind}")
+
+    result: List[EncodedClaimSet] = []
+    for _ in range(count):
+        flags, pos = _read_varint(data, pos)
+        size, pos = _read_varint(data, pos)
+        claims: List[QueryTuple] = []
+        previous = b""
+        for _ in range(size):
+            verb_id, pos = _read_varint(data, pos)
+            if verb_id >> 1 >= len(VERBS_V1):
+                raise ValueError(f"unknown verb id in claims payload: {verb_id >> 1}")
+            verb = VERBS_V1[verb_id >> 1]
+            if verb_id & 1:
+                claims.append((verb, None))
+                continue
+            shared, pos = _read_varint(data, pos)
+            if shared > len(previous):
+                raise ValueError(f"invalid shared prefix in claims payload: {shared}")
+            rest, pos = _read_varint(data, pos)
+            encoded = previous[:shared] + data[pos : pos + rest]
+            pos += rest
+            if pos > len(data):
+                raise ValueError("truncated claims payload")
+            resource: Optional[str] = encoded.decode("utf-8")
+            claims.append((verb, resource))
+            previous = encoded
+        result.append((claims, flags))
+
+    if pos != len(data):
+        raise ValueError("unexpected trailing data in claims payload")
+    return result
+
+
+def _shared_prefix(a: bytes, b: bytes) -> int:
+    size = min(len(a), len(b))
+    idx = 0
+    while idx < size and a[idx] == b[idx]:
+        idx += 1
+    return idx
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise ValueError("truncated claims payload")
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
@@ -0,0 +1,228 @@
+"""WhoCanIndex object, an inverted index of which ids can do a query among many abilities."""
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    Iterator,
+    Set,
+    Tuple,
+)
+
+from claims.core import checking_keys
+from claims.parsing import QueryTuple, RawQuery, parse_query
+from claims.pool import ClaimSetKey, claim_set_key
+
+if TYPE_CHECKING:  # pragma: no cover
+    from claims.ability import Ability
+
+_AbilityKey = Tuple[ClaimSetKey, ClaimSetKey]
+_Inverted = Dict[QueryTuple, FrozenSet[int]]
+
+
+class WhoCanIndex:
+    """
+    Immutable inverted index over many `(id, Ability)` pairs, answering which ids
+    can do a query by walking only the claims that could check it (the global
+    claim of its verb and each prefix of its resource).
+
+    Ids with equal abilities (e.g. the same role) share one group, and each claim
+    maps to the groups holding it as permitted or prohibited, so the index grows
+    with the distinct abilities rather than with the ids.
+    """
+
+    __slots__ = (
+        "_group_of",
+        "_groups",
+        "_abilities",
+        "_members",
+        "_permitted",
+        "_prohibited",
+        "_next_group",
+    )
+
+    _group_of: Dict[Hashable, int]
+    _groups: Dict[_AbilityKey, int]
+    _abilities: Dict[int, _AbilityKey]
+    _members: Dict[int, FrozenSet[Hashable]]
+    _permitted: _Inverted
+    _prohibited: _Inverted
+    _next_group: int
+
+    def __init__(self, pairs: Iterable[Tuple[Hashable, "Ability"]] = ()):
+        """Builds the index from the `(id, Ability)` pairs. A repeated id keeps its last ability."""
+        for name in self.__slots__:
+            object.__setattr__(self, name, {})
+        object.__setattr__(self, "_next_group", 0)
+
+        # ids grouped in mutable sets first, so each id is a single set insertion
+        members: Dict[int, Set[Hashable]] = {}
+        # group of each ability instance (kept alive here, so its id is not reused)
+        seen: Dict[int, Tuple["Ability", int]] = {}
+        for id_, ability in pairs:
+            previous = self._group_of.get(id_)
+            if previous is not None:
+                members[previous].discard(id_)
+            if id(ability) in seen:
+                group = seen[id(ability)][1]
+            else:
+                group = self._group(_ability_key(ability), add_claims=False)
+                seen[id(ability)] = (ability, group)
+            members.setdefault(group, set()).add(id_)
+            self._group_of[id_] = group
+
+        for group, ids in members.items():
+            if ids:
+                self._members[group] = frozenset(ids)
+            else:
+                del self._groups[self._abilities.pop(group)]
+
+        # claims inverted once all the groups are known, so each group is a
+        # single set insertion too instead of a new frozenset per group
+        self._permitted.update(_invert(self._abilities, 0))
+        self._prohibited.update(_invert(self._abilities, 1))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Raises AttributeError: WhoCanIndex is immutable."""
+        raise AttributeError(f"WhoCanIndex is immutable, cannot set {name}")
+
+    def __reduce__(self) -> Tuple[Callable[..., "WhoCanIndex"], Tuple[Any, ...]]:
+        """Pickles (and copies) the built index as it is, without rebuilding it."""
+        return _restore, tuple(getattr(self, name) for name in self.__slots__)
+
+    def __len__(self) -> int:
+        """Number of ids."""
+        return len(self._group_of)
+
+    def __contains__(self, id_: Hashable) -> bool:
+        """True if the id is in the index."""
+        return id_ in self._group_of
+
+    def __iter__(self) -> Iterator[Hashable]:
+        """Iterates over the ids."""
+        return iter(self._group_of)
+
+    def group_count(self) -> int:
+        """Number of distinct abilities among the ids."""
+        return len(self._members)
+
+    def who_can(self, query: RawQuery) -> FrozenSet[Hashable]:
+        """Returns the ids whose ability `can()` the query: a permitted claim checks it, and no prohibited claim does."""
+        parsed = parse_query(query)
+        granted: Set[int] = set()
+        denied: Set[int] = set()
+        for key in checking_keys(parsed):
+            granted.update(self._permitted.get(key, ()))
+            denied.update(self._prohibited.get(key, ()))
+
+        result: Set[Hashable] = set()
+        for group in granted - denied:
+            result.update(self._members[group])
+        return frozenset(result)
+
+    def with_ability(self, id_: Hashable, ability: "Ability") -> "WhoCanIndex":
+        """Returns a new index with the id (re)built with the given ability, leaving this one untouched."""
+        derived = self._copy()
+        derived._assign(id_, ability)
+        return derived
+
+    def without_id(self, id_: Hashable) -> "WhoCanIndex":
+        """Returns a new index without the id (self if not present), leaving this one untouched."""
+        if id_ not in self._group_of:
+            return self
+        derived = self._copy()
+        derived._unassign(id_)
+        return derived
+
+    def _copy(self) -> "WhoCanIndex":
+        """Shallow copy: the frozensets are shared, and replaced (never changed) when assigning."""
+        derived = WhoCanIndex()
+        for name in self.__slots__:
+            value = getattr(self, name)
+            object.__setattr__(
+                derived, name, dict(value) if name != "_next_group" else value
+            )
+        return derived
+
+    def _assign(self, id_: Hashable, ability: "Ability") -> None:
+        """Only used while building a new derived index."""
+        group = self._group(_ability_key(ability))
+        if self._group_of.get(id_) == group:
+            return
+        self._unassign(id_)
+        self._members[group] = self._members.get(group, frozenset()) | {id_}
+        self._group_of[id_] = group
+
+    def _unassign(self, id_: Hashable) -> None:
+        group = self._group_of.pop(id_, None)
+        if group is None:
+            return
+        members = self._members[group] - {id_}
+        if members:
+            self._members[group] = members
+        else:
+            del self._members[group]
+            self._drop_group(group)
+
+    def _group(self, key: _AbilityKey, add_claims: bool = True) -> int:
+        """Group of the ability key, adding it (with its claims, unless `add_claims` is False) if new."""
+        group = self._groups.get(key)
+        if group is None:
+            group = self._next_group
+            object.__setattr__(self, "_next_group", group + 1)
+            self._groups[key] = group
+            self._abilities[group] = key
+            if add_claims:
+                _add_group(self._permitted, key[0], group)
+                _add_group(self._prohibited, key[1], group)
+        return group
+
+    def _drop_group(self, group: int) -> None:
+        """Removes a group left without ids, and its claims."""
+        key = self._abilities.pop(group)
+        del self._groups[key]
+        _remove_group(self._permitted, key[0], group)
+        _remove_group(self._prohibited, key[1], group)
+
+
+def _ability_key(ability: "Ability") -> _AbilityKey:
+    return (
+        claim_set_key(ability.permitted.claims),
+        claim_set_key(ability.prohibited.claims),
+    )
+
+
+def _restore(*state: Any) -> WhoCanIndex:
+    index = WhoCanIndex.__new__(WhoCanIndex)
+    for name, value in zip(WhoCanIndex.__slots__, state):
+        object.__setattr__(index, name, value)
+    return index
+
+
+def _invert(abilities: Dict[int, _AbilityKey], side: int) -> _Inverted:
+    """Groups holding each claim, on the given side (0 for permitted, 1 for prohibited) of their ability keys."""
+    groups_of: Dict[QueryTuple, Set[int]] = {}
+    for group, key in abilities.items():
+        for claim in key[side]:
+            groups = groups_of.get(claim)
+            if groups is None:
+                groups = groups_of[claim] = set()
+            groups.add(group)
+    return {claim: frozenset(groups) for claim, groups in groups_of.items()}
+
+
+def _add_group(inverted: _Inverted, claims: ClaimSetKey, group: int) -> None:
+    for claim in claims:
+        inverted[claim] = inverted.get(claim, frozenset()) | {group}
+
+
+def _remove_group(inverted: _Inverted, claims: ClaimSetKey, group: int) -> None:
+    for claim in claims:
+        groups = inverted[claim] - {group}
+        if groups:
+            inverted[claim] = groups
+        else:
+            del inverted[claim]
@@ -16,7 +16,7 @@ setup(
     zip_safe=False,
     # Basic project information
     name="claims",
-    version='0.3.0',
+    version="0.3.0",
     # Authorship and online reference
     author="Eduardo Turiño",
     author_email="eturino@eturino.com",
@@ -38,7 +38,7 @@ setup(
         "Programming Language :: Python :: 3.9",
     ],
     # Package configuration
-    packages=find_packages(exclude=("tests",)),
+    packages=find_packages(exclude=("tests", "tests.*", "benchmarks", "benchmarks.*")),
     include_package_data=True,
     python_requires=">= 3.6",
     package_data={"claims": ["py.typed"]},
@@ -46,6 +46,9 @@ setup(
         "pydantic>=2.4,<3",
         "key_set",
     ],
+    extras_require={
+        "numpy": ["numpy"],
+    },
     # Licensing and copyright
     license="Apache 2.0",
 )
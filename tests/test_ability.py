@@ -9,17 +9,23 @@ along with the code formatter.
 import __future__  # noqa: F401
 
 import json  # noqa: F401
+import random
 from os import path  # noqa: F401
 from re import IGNORECASE, sub  # noqa: F401
-from typing import List
+from typing import Iterator, List, Union
 
 import key_set
 import pytest
 
 import claims  # noqa: F401
-from claims import Claim, build_claim, build_claim_set
+from claims import Claim, QueryTuple, build_claim, build_claim_set
 from claims.ability import build_ability
-from claims.errors import InvalidClaimError, InvalidClaimVerbError
+from claims.errors import (
+    InvalidClaimError,
+    InvalidClaimResourceError,
+    InvalidClaimVerbError,
+)
+from claims.parsing import ALLOWED_VERBS
 
 
 class TestAbility:  # noqa: D101
@@ -113,6 +119,200 @@ class TestAbility:  # noqa: D101
         actual = build_ability(["read:valid"], [])
         assert not actual.can("read:another")
 
+    def test_can_many(self) -> None:  # noqa: D102, D103
+        ability = build_ability(
+            ["read:clients", "admin:*"], ["read:clients.secret", "admin:root"]
+        )
+        queries = [
+            "read:clients.secret.stuff",
+            "admin:root",
+            "read:clients.a",
+            "admin:other",
+            "read:*",
+            "read:clients",
+        ]
+        assert ability.can_many(queries) == [ability.can(q) for q in queries]
+
+    def test_simplify(self) -> None:  # noqa: D102, D103
+        ability = build_ability(
+            [
+                "read:clients",
+                "read:clients.a.nested",
+                "read:clients.b.nested",
+                "admin:clients.a",
+                "admin:clients.b",
+            ],
+            [
+                "read:clients.b",
+                "read:others",
+                "admin:clients",
+                "admin:clients.a",
+                "update:*",
+            ],
+        )
+        actual = ability.simplify()
+        assert actual.permitted.claims_strings() == ["read:clients"]
+        assert actual.prohibited.claims_strings() == ["read:clients.b"]
+        assert actual.simplify() is actual
+
+    def test_simplify_same_decisions(self) -> None:  # noqa: D102, D103
+        rnd = random.Random(5)
+        segments = ["aa", "bb", "bb-c"]
+
+        def raw() -> str:
+            verb = rnd.choice(["read", "admin"])
+            if rnd.random() < 0.05:
+                return f"{verb}:*"
+            depth = rnd.randint(1, 3)
+            return f"{verb}:" + ".".join(rnd.choice(segments) for _ in range(depth))
+
+        for _ in range(30):
+            ability = build_ability(
+                [raw() for _ in range(rnd.randint(0, 10))],
+                [raw() for _ in range(rnd.randint(0, 10))],
+            )
+            simplified = ability.simplify()
+            assert len(simplified.permitted.claims) <= len(ability.permitted.claims)
+            assert len(simplified.prohibited.claims) <= len(ability.prohibited.claims)
+            for query in ["read:*", "admin:*"] + [raw() for _ in range(40)]:
+                assert simplified.can(query) == ability.can(query)
+
+    def test_allowed_verbs(self) -> None:  # noqa: D102, D103
+        ability = build_ability(
+            ["read:clients", "update:clients.a", "admin:*", "delete:clients.a.b"],
+            ["admin:clients.a", "read:clients.a.secret"],
+        )
+        assert ability.allowed_verbs("clients.a") == ["read", "update"]
+        assert ability.allowed_verbs("clients.a.b") == ["read", "delete", "update"]
+        assert ability.allowed_verbs("clients.a.secret") == ["update"]
+        assert ability.allowed_verbs("clients") == ["admin", "read"]
+        assert ability.allowed_verbs(None) == ["admin"]
+        assert ability.can_any(["create", "update"], "clients.a")
+        assert not ability.can_any(["create", "admin"], "clients.a")
+        assert not ability.can_any([], "clients.a")
+        assert ability.can_all(["read", "update"], "clients.a")
+        assert not ability.can_all(["read", "admin"], "clients.a")
+        assert ability.can_all([], "clients.a")
+        with pytest.raises(InvalidClaimVerbError):
+            ability.can_any(["read", "blah"], "clients")
+        with pytest.raises(InvalidClaimResourceError):
+            ability.allowed_verbs("clients!")
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_allowed_verbs_same_as_can(self, indexed: bool) -> None:  # noqa: D102, D103
+        rnd = random.Random(9)
+        segments = ["aa", "bb", "bb-c"]
+
+        def resource() -> str:
+            depth = rnd.randint(1, 3)
+            return ".".join(rnd.choice(segments) for _ in range(depth))
+
+        def raw() -> str:
+            verb = rnd.choice(ALLOWED_VERBS)
+            return f"{verb}:*" if rnd.random() < 0.05 else f"{verb}:{resource()}"
+
+        for _ in range(20):
+            ability = build_ability(
+                [raw() for _ in range(rnd.randint(0, 12))],
+                [raw() for _ in range(rnd.randint(0, 6))],
+                indexed=indexed,
+            )
+            for res in [resource() for _ in range(20)]:
+                expected = [v for v in ALLOWED_VERBS if ability.can((v, res))]
+                assert ability.allowed_verbs(res) == expected
+                assert ability.compile().allowed_verbs(res) == expected
+                verbs = rnd.sample(ALLOWED_VERBS, 2)
+                assert ability.can_any(verbs, res) == any(v in expected for v in verbs)
+                assert ability.can_all(verbs, res) == all(v in expected for v in verbs)
+
+    def test_filter_resources(self) -> None:  # noqa: D102, D103
+        ability = build_ability(
+            ["read:clients.1", "read:clients.2", "update:clients", "read:stuff.3.x"],
+            ["read:clients.2", "update:clients.4", "read:stuff"],
+        )
+        ids = iter([1, 2, 3, 4, "1"])
+        assert list(ability.filter_resources("read", "clients", ids)) == [1, "1"]
+        assert list(ability.filter_resources("update", "clients", range(6))) == [
+            0,
+            1,
+            2,
+            3,
+            5,
+        ]
+        assert list(ability.filter_resources("read", "stuff", ["3", "4"])) == []
+        assert list(ability.filter_resources("read", "nope", ["1"])) == []
+        assert list(ability.filter_resources("update", None, ["clients"])) == [
+            "clients"
+        ]
+        with pytest.raises(InvalidClaimVerbError):
+            ability.filter_resources("blah", "clients", [1])
+
+    def test_filter_resources_not_segments(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], ["read:clients.1"])
+        ids = ["1.2", "2", "1", "2.3", "*"]
+        expected = [i for i in ids if ability.can(("read", f"clients.{i}"))]
+        assert expected == ["2", "2.3", "*"]
+        assert list(ability.filter_resources("read", "clients", ids)) == expected
+        # a prohibited claim deeper than the direct children
+        deeper = build_ability(["read:clients"], ["read:clients.1.2"])
+        assert list(deeper.filter_resources("read", "clients", ids)) == [
+            "2",
+            "1",
+            "2.3",
+            "*",
+        ]
+        with pytest.raises(InvalidClaimResourceError):
+            list(ability.filter_resources("read", "clients", ["2", "a-"]))
+        with pytest.raises(InvalidClaimResourceError):
+            list(ability.filter_resources("read", None, ["clients", "x"]))
+
+    def test_filter_resources_lazy(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], ["read:clients.2"])
+        read: List[int] = []
+
+        def ids() -> Iterator[int]:
+            for id_ in range(1000):
+                read.append(id_)
+                yield id_
+
+        filtered = ability.filter_resources("read", "clients", ids())
+        assert next(filtered) == 0
+        assert next(filtered) == 1
+        assert next(filtered) == 3
+        assert read == [0, 1, 2, 3]
+        # prohibited parent: the ids are not even read
+        read.clear()
+        prohibited = build_ability(["read:*"], ["read:clients"])
+        assert list(prohibited.filter_resources("read", "clients", ids())) == []
+        assert read == []
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_filter_same_as_can(self, indexed: bool) -> None:  # noqa: D102, D103
+        rnd = random.Random(11)
+        segments = ["aa", "bb", "cc", "dd"]
+
+        def raw() -> str:
+            verb = rnd.choice(["read", "update"])
+            depth = rnd.randint(0, 3)
+            if depth == 0:
+                return f"{verb}:*"
+            return f"{verb}:" + ".".join(rnd.choice(segments) for _ in range(depth))
+
+        for _ in range(30):
+            ability = build_ability(
+                [raw() for _ in range(rnd.randint(0, 10))],
+                [raw() for _ in range(rnd.randint(0, 5))],
+                indexed=indexed,
+            )
+            ids = segments + ["aa.bb", "bb.cc.dd"]
+            for parent in [None, "aa", "bb", "aa.bb"]:
+                expected = [
+                    s
+                    for s in ids
+                    if ability.can(("read", s if parent is None else f"{parent}.{s}"))
+                ]
+                assert list(ability.filter_resources("read", parent, ids)) == expected
+
     def test_cannot_true(self) -> None:  # noqa: D102, D103
         actual = build_ability(["read:valid"], [])
         assert not actual.cannot("read:valid.some.stuff")
@@ -137,6 +337,31 @@ class TestAbility:  # noqa: D101
         actual = build_ability(["read:valid"], [])
         assert not actual.is_explicitly_prohibited("read:another")
 
+    def test_build_indexed(self) -> None:  # noqa: D102, D103
+        ability = build_ability(
+            ["read:clients.a", "read:clients.b.nested"],
+            ["read:clients.b"],
+            indexed=True,
+        )
+        assert ability.permitted.is_indexed()
+        assert ability.prohibited.is_indexed()
+        actual = ability.access_to_resources("read:clients")
+        assert isinstance(actual, key_set.KeySetSome)
+        assert actual.elements() == {"a"}
+
+    def test_build_trusted(self) -> None:  # noqa: D102, D103
+        permitted: List[Union[str, QueryTuple]] = [
+            "read:clients.*",
+            "read:clients.a",
+            ("admin", None),
+        ]
+        prohibited = ["read:clients.b", "read:clients.b"]
+        ability = build_ability(permitted, prohibited, trusted=True, indexed=True)
+        assert ability == build_ability(permitted, prohibited)
+        assert ability.permitted.is_indexed()
+        assert ability.cannot("read:clients.b.one")
+        assert ability.can("admin:stuff")
+
     def test_access_to_resources_direct(self) -> None:  # noqa: D102, D103
         ability = build_ability(["read:clients"], [])
         actual = ability.access_to_resources("read:clients")
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the AccessTree of an ability."""
+
+import random
+
+import key_set
+import pytest
+
+from claims import Ability, build_ability
+from claims.access_tree import AccessTree
+
+ABILITY = build_ability(
+    ["read:clients", "read:projects.a.tasks", "read:projects.b", "admin:*"],
+    ["read:clients.secret", "read:projects.b.x.y"],
+)
+
+
+def _assert_same_as_access_to_resources(
+    ability: Ability, query: str, tree: AccessTree, depth: int
+) -> None:
+    assert tree.access == ability.access_to_resources(query)
+    if depth == 0:
+        assert tree.children == {}
+    prefix = query[:-1] if query.endswith(":*") else f"{query}."
+    for segment, child in tree.children.items():
+        child_query = f"{prefix}{segment}"
+        _assert_same_as_access_to_resources(ability, child_query, child, depth - 1)
+
+
+class TestAccessTree:  # noqa: D101
+    def test_access_tree(self) -> None:  # noqa: D102, D103
+        tree = ABILITY.access_tree("read:*", depth=3)
+        assert tree.access == key_set.build_some_or_none(["clients", "projects"])
+        assert list(tree.children) == ["clients", "projects"]
+        clients = tree.children["clients"]
+        assert clients.access == key_set.build_all_except_some_or_all(["secret"])
+        assert clients.children["secret"].access == key_set.build_none()
+        projects = tree.children["projects"]
+        assert projects.access == key_set.build_some_or_none(["a", "b"])
+        assert projects.children["a"].children["tasks"].access == key_set.build_all()
+        # as deep as asked only
+        assert projects.children["b"].children["x"].children == {}
+        assert projects.children["b"].children["x"].access == (
+            key_set.build_all_except_some_or_all(["y"])
+        )
+
+    def test_depth(self) -> None:  # noqa: D102, D103
+        tree = ABILITY.access_tree("read:projects", depth=0)
+        assert tree == AccessTree(key_set.build_some_or_none(["a", "b"]), {})
+        assert list(ABILITY.access_tree("read:projects").children) == ["a", "b"]
+        with pytest.raises(ValueError):
+            ABILITY.access_tree("read:projects", depth=-1)
+
+    def test_global(self) -> None:  # noqa: D102, D103
+        tree = ABILITY.access_tree("admin:clients", depth=2)
+        assert tree == AccessTree(key_set.build_all(), {})
+        assert ABILITY.access_tree("delete:*", depth=2) == AccessTree(
+            key_set.build_none(), {}
+        )
+
+    def test_same_as_access_to_resources_random(self) -> None:  # noqa: D102, D103
+        rnd = random.Random(11)
+        segments = ["aa", "bb", "bb-c", "bbb"]
+
+        def raw() -> str:
+            if rnd.random() < 0.05:
+                return "read:*"
+            depth = rnd.randint(1, 4)
+            return "read:" + ".".join(rnd.choice(segments) for _ in range(depth))
+
+        for _ in range(30):
+            ability = build_ability(
+                [raw() for _ in range(rnd.randint(0, 10))],
+                [raw() for _ in range(rnd.randint(0, 10))],
+            )
+            for query in ["read:*", "read:aa", "read:bb.aa", raw()]:
+                depth = rnd.randint(0, 3)
+                tree = ability.access_tree(query, depth)
+                _assert_same_as_access_to_resources(ability, query, tree, depth)
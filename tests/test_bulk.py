@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the bulk construction of abilities."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import pytest
+
+from claims import build_ability
+from claims.bulk import BulkProgress, build_abilities_bulk
+
+RECORDS: List[Any] = [
+    ("reader", ["read:clients"], ["read:clients.secret"]),
+    ("admin", ["admin:*", "read:*"], []),
+    ("bad-verb", ["blah:clients"], []),
+    ("bad-resource", ["read:clients"], ["read:stuff!#"]),
+    ("short",),
+    (7, [("read", "clients.public")], []),
+]
+
+
+class TestBulk:  # noqa: D101
+    def test_build(self) -> None:  # noqa: D102, D103
+        with ThreadPoolExecutor(2) as executor:
+            result = build_abilities_bulk(RECORDS, chunk_size=2, executor=executor)
+        assert list(result.abilities) == ["reader", "admin", 7]
+        assert result.ability("reader") == build_ability(
+            ["read:clients"], ["read:clients.secret"]
+        )
+        assert dict(result.items())[7].can("read:clients.public.one")
+
+        assert [(e.key, e.position, e.error_type) for e in result.errors] == [
+            ("bad-verb", 2, "InvalidClaimVerbError"),
+            ("bad-resource", 3, "InvalidClaimError"),
+            (None, 4, "ValueError"),
+        ]
+
+    def test_progress(self) -> None:  # noqa: D102, D103
+        reports: List[BulkProgress] = []
+        with ThreadPoolExecutor(1) as executor:
+            build_abilities_bulk(
+                iter(RECORDS),
+                chunk_size=4,
+                executor=executor,
+                progress=reports.append,
+            )
+        assert reports == [
+            BulkProgress(records=4, errors=2, chunks=1),
+            BulkProgress(records=6, errors=3, chunks=2),
+        ]
+
+    def test_trusted(self) -> None:  # noqa: D102, D103
+        with ThreadPoolExecutor(1) as executor:
+            result = build_abilities_bulk(RECORDS[:3], executor=executor, trusted=True)
+        assert list(result.abilities) == ["reader", "admin"]
+        # not validated, but the unknown verb cannot be encoded
+        assert [(e.key, e.error_type) for e in result.errors] == [
+            ("bad-verb", "ValueError")
+        ]
+
+    def test_invalid_chunk_size(self) -> None:  # noqa: D102, D103
+        with pytest.raises(ValueError):
+            build_abilities_bulk(RECORDS, chunk_size=0)
+
+    def test_processes(self) -> None:  # noqa: D102, D103
+        records = [
+            (i, [f"read:clients.c{i}", "admin:stuff"], [f"read:clients.c{i}.x"])
+            for i in range(50)
+        ]
+        result = build_abilities_bulk(records, chunk_size=7, max_workers=2)
+        assert result.errors == []
+        assert list(result.abilities) == list(range(50))
+        for key, permitted, prohibited in records:
+            assert result.ability(key) == build_ability(permitted, prohibited)
@@ -9,15 +9,27 @@ along with the code formatter.
 import __future__  # noqa: F401
 
 import json  # noqa: F401
+import random
 from os import path  # noqa: F401
 from re import IGNORECASE, sub  # noqa: F401
+from typing import List, Union
 
 import pytest
 
 import claims  # noqa: F401
 from claims.claim import build_claim
 from claims.claim_set import ClaimSet, build_claim_set
-from claims.errors import InvalidClaimError, InvalidClaimVerbError
+from claims.errors import (
+    InvalidClaimError,
+    InvalidClaimResourceError,
+    InvalidClaimVerbError,
+)
+from claims.parsing import (
+    QueryTuple,
+    disable_trusted_validation,
+    enable_trusted_validation,
+    is_trusted_validation_enabled,
+)
 
 
 class TestClaimSet:  # noqa: D101
@@ -168,3 +180,298 @@ class TestClaimSet:  # noqa: D101
         ).claims
         assert actual is not claim_set
         assert actual.claims == expected_claims
+
+    def test_build_indexed(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(["admin:*", "read:valid"], indexed=True)
+        assert claim_set.is_indexed()
+        assert claim_set.check("admin:something")
+        assert claim_set.check("read:valid.nested")
+        assert not claim_set.check("read:validity")
+        assert claim_set == build_claim_set(["admin:*", "read:valid"])
+
+    def test_build_index_once(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(["read:valid"])
+        assert not claim_set.is_indexed()
+        index = claim_set.build_index()
+        assert claim_set.build_index() is index
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_check_many(self, indexed: bool) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(
+            ["admin:*", "read:clients", "read:clients-x.a", "read:other.b.c"],
+            indexed=indexed,
+        )
+        queries = [
+            "read:other.b.c.d",
+            "admin:anything",
+            "read:clients.a",
+            "read:clients-x",
+            "read:clients-x.a.b",
+            "read:*",
+            "read:other.b",
+            "update:clients",
+            "read:clients",
+        ]
+        expected = [claim_set.check(q) for q in queries]
+        assert claim_set.check_many(queries) == expected
+        assert expected == [True, True, True, False, True, False, False, False, True]
+
+    def test_check_many_keeps_keys(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(["read:clients", "admin:*"])
+        assert claim_set.check_many(["read:clients.a"]) == [True]
+        keys = claim_set._segment_keys
+        assert keys is not None
+        assert claim_set.check_many(["admin:aa", "read:other"]) == [True, False]
+        assert claim_set._segment_keys is keys
+
+        # the cached keys are not shared with a ClaimSet of other claims
+        other = claim_set.add_if_not_checked("read:other")
+        assert other._segment_keys is None
+        assert other.check_many(["read:other"]) == [True]
+        updated = claim_set.model_copy(update={"claims": other.claims})
+        assert updated.check_many(["read:other"]) == [True]
+
+    def test_check_many_random(self) -> None:  # noqa: D102, D103
+        rnd = random.Random(42)
+        segments = ["aa", "bb", "bb-c", "aab", "a_b"]
+
+        def raw() -> str:
+            verb = rnd.choice(["read", "admin"])
+            if rnd.random() < 0.05:
+                return f"{verb}:*"
+            depth = rnd.randint(1, 4)
+            return f"{verb}:" + ".".join(rnd.choice(segments) for _ in range(depth))
+
+        for _ in range(20):
+            claim_set = build_claim_set([raw() for _ in range(rnd.randint(0, 15))])
+            indexed = build_claim_set(claim_set.claims, indexed=True)
+            queries = [raw() for _ in range(50)]
+            expected = [claim_set.check(q) for q in queries]
+            assert claim_set.check_many(queries) == expected
+            assert indexed.check_many(queries) == expected
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_checked_verbs(self, indexed: bool) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(
+            ["update:clients.a", "read:clients", "admin:*", "delete:clients.a.b"],
+            indexed=indexed,
+        )
+        assert claim_set.checked_verbs("clients.a") == ["admin", "read", "update"]
+        assert claim_set.checked_verbs("clients.a.b.c") == [
+            "admin",
+            "read",
+            "delete",
+            "update",
+        ]
+        assert claim_set.checked_verbs("clients-a") == ["admin"]
+        assert claim_set.checked_verbs(None) == ["admin"]
+        assert build_claim_set([]).checked_verbs("clients") == []
+        with pytest.raises(InvalidClaimResourceError):
+            claim_set.checked_verbs("bad!")
+
+    def test_claims_below(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(
+            ["read:*", "read:clients", "read:clients.a", "read:clients-b", "admin:x.y"]
+        )
+        assert [str(c) for c in claim_set.claims_below("read:clients")] == [
+            "read:clients.a"
+        ]
+        assert [str(c) for c in claim_set.claims_below("read:*")] == [
+            "read:clients",
+            "read:clients-b",
+            "read:clients.a",
+        ]
+        assert claim_set.claims_below("delete:*") == []
+
+    def test_check_many_errors(self) -> None:  # noqa: D102, D103
+        with pytest.raises(InvalidClaimVerbError):
+            build_claim_set(["read:valid"]).check_many(["read:valid", "blah:what"])
+
+    def test_add_if_not_checked_list_sorted_and_shared(  # noqa: D102, D103
+        self,
+    ) -> None:
+        claim_set = build_claim_set(["read:bb", "read:dd", "admin:*", "update:aa"])
+        actual = claim_set.add_if_not_checked_list(
+            ["read:cc", "read:*", "read:cc", "create:zz", "read:aa.bb"]
+        )
+        expected = build_claim_set(
+            ["read:bb", "read:dd", "admin:*", "update:aa", "read:cc", "read:*"]
+            + ["create:zz", "read:aa.bb"]
+        )
+        assert actual.claims == expected.claims
+        assert all(any(c is o for o in actual.claims) for c in claim_set.claims)
+        assert claim_set.claims_strings() == [
+            "admin:*",
+            "read:bb",
+            "read:dd",
+            "update:aa",
+        ]
+
+    def test_add_if_not_checked_list_indexed(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(["read:clients.aa", "admin:*"], indexed=True)
+        actual = claim_set.add_if_not_checked_list(["read:clients.bb", "read:others"])
+        assert actual.is_indexed()
+        assert actual.check("read:clients.bb.cc")
+        assert actual.check("read:others")
+        assert actual.check("read:clients.aa")
+        assert not claim_set.check("read:clients.bb.cc")
+        assert not claim_set.check("read:others")
+
+    def test_add_if_not_checked_list_prefixes(self) -> None:  # noqa: D102, D103
+        # claims sorting between a prefix and its children do not check them
+        claim_set = build_claim_set(["read:clients", "read:clients-1", "read:cl"])
+        actual = claim_set.add_if_not_checked_list(
+            ["read:clients.1.a", "read:clients-1.b", "read:clientsb", "read:cl.d"]
+        )
+        assert actual.claims_strings() == [
+            "read:cl",
+            "read:clients",
+            "read:clients-1",
+            "read:clientsb",
+        ]
+        assert claim_set.add_if_not_checked("admin:*").claims_strings()[0] == "admin:*"
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_has_exact(self, indexed: bool) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(
+            ["read:*", "read:clients", "admin:clients.aa"], indexed=indexed
+        )
+        assert claim_set.has_exact("read:*")
+        assert claim_set.has_exact("read:clients")
+        assert claim_set.has_exact(("admin", "clients.aa"))
+        assert not claim_set.has_exact("admin:clients")
+        assert not claim_set.has_exact("read:clients.aa")
+        assert not claim_set.has_exact("update:*")
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_without_exact_list(self, indexed: bool) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(
+            ["read:*", "read:clients", "read:clients.aa", "admin:clients.aa"],
+            indexed=indexed,
+        )
+        actual = claim_set.without_exact_list(
+            ["read:clients", "admin:clients.aa", "update:nope"]
+        )
+        assert actual.claims_strings() == ["read:*", "read:clients.aa"]
+        assert actual.is_indexed() == indexed
+        assert not actual.check("admin:clients.aa")
+        assert actual.direct_children_of("read:clients") == ["aa"]
+        assert claim_set.check("admin:clients.aa")
+        assert claim_set.without_exact_list(["update:nope"]) is claim_set
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_without_exact(self, indexed: bool) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(
+            ["read:clients", "read:clients.aa", "admin:*"], indexed=indexed
+        )
+        actual = claim_set.without_exact("read:clients")
+        assert actual.claims_strings() == ["admin:*", "read:clients.aa"]
+        assert actual.check("read:clients.aa.bb")
+        assert not actual.check("read:clients.bb")
+        assert claim_set.without_exact("read:clients.bb") is claim_set
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    def test_direct_children_and_descendants_random(  # noqa: D102, D103
+        self, indexed: bool
+    ) -> None:
+        rnd = random.Random(7)
+        segments = ["aa", "bb", "bb-c", "aab", "a_b", ".cc"]
+
+        def resource(depth: int) -> str:
+            return ".".join(["root"] + [rnd.choice(segments) for _ in range(depth)])
+
+        for _ in range(20):
+            claim_list = [
+                build_claim(
+                    f"{rnd.choice(['read', 'admin'])}:{resource(rnd.randint(0, 3))}"
+                )
+                for _ in range(rnd.randint(0, 20))
+            ]
+            claim_set = build_claim_set(claim_list, indexed=indexed)
+            queries = ["read:*", "admin:*"] + [
+                f"read:{resource(rnd.randint(0, 2))}" for _ in range(20)
+            ]
+            for query in queries:
+                children = [c.direct_child_of(query) for c in claim_list]
+                descendants = [c.direct_descendant_of(query) for c in claim_list]
+                assert claim_set.direct_children_of(query) == sorted(
+                    {c for c in children if c is not None}
+                )
+                assert claim_set.direct_descendants_of(query) == sorted(
+                    {c for c in descendants if c is not None}
+                )
+
+    def test_minimized(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(
+            [
+                "read:*",
+                "read:clients",
+                "read:clients.1.invoices",
+                "admin:clients",
+                "admin:clients-other",
+                "admin:clients.1",
+                "admin:clients.1.invoices",
+                "admin:clients-other.2",
+                "update:aa..bb",
+                "update:aa..bb.cc",
+            ]
+        )
+        actual = claim_set.minimized()
+        assert actual.claims_strings() == [
+            "admin:clients",
+            "admin:clients-other",
+            "read:*",
+            "update:aa..bb",
+        ]
+        assert actual.minimized() is actual
+
+    def test_minimized_same_checks(self) -> None:  # noqa: D102, D103
+        rnd = random.Random(3)
+        segments = ["aa", "bb", "bb-c", "aab"]
+
+        def raw() -> str:
+            depth = rnd.randint(1, 4)
+            return "read:" + ".".join(rnd.choice(segments) for _ in range(depth))
+
+        for _ in range(20):
+            claim_set = build_claim_set([raw() for _ in range(15)])
+            minimized = claim_set.minimized()
+            assert len(minimized.claims) <= len(claim_set.claims)
+            for query in [raw() for _ in range(50)]:
+                assert minimized.check(query) == claim_set.check(query)
+
+    def test_build_minimize(self) -> None:  # noqa: D102, D103
+        actual = build_claim_set(
+            ["read:clients", "read:clients.1"], minimize=True, indexed=True
+        )
+        assert actual.claims_strings() == ["read:clients"]
+        assert actual.is_indexed()
+        assert actual.check("read:clients.1")
+
+    def test_build_trusted(self) -> None:  # noqa: D102, D103
+        raw: List[Union[str, QueryTuple]] = [
+            "read:clients.*",
+            "admin:*",
+            ("read", "clients"),
+            "read:clients.1",
+        ]
+        actual = build_claim_set(raw, trusted=True)
+        assert actual == build_claim_set(raw)
+        assert actual.claims_strings() == ["admin:*", "read:clients", "read:clients.1"]
+
+        already_built = build_claim_set(actual.claims, trusted=True, indexed=True)
+        assert already_built == actual
+        assert already_built.is_indexed()
+
+    def test_build_trusted_skips_validation(self) -> None:  # noqa: D102, D103
+        actual = build_claim_set(["blah:what"], trusted=True)
+        assert actual.claims_strings() == ["blah:what"]
+
+    def test_build_trusted_validation_enabled(self) -> None:  # noqa: D102, D103
+        enable_trusted_validation()
+        try:
+            with pytest.raises(InvalidClaimVerbError):
+                build_claim_set(["blah:what"], trusted=True)
+        finally:
+            disable_trusted_validation()
+        assert not is_trusted_validation_enabled()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for CompiledAbility, checked against the results of Ability."""
+
+import copy
+import pickle
+from typing import List
+
+import pytest
+
+from claims.ability import Ability, build_ability
+from claims.compiled import CompiledAbility
+from claims.parsing import parse_query
+
+ABILITIES = [
+    (["read:*"], []),
+    (["read:*"], ["read:clients.secret"]),
+    (["read:*"], ["read:*"]),
+    (["read:clients"], ["read:clients.a"]),
+    (["read:clients.a", "read:clients.b", "admin:*"], ["admin:clients"]),
+    (
+        ["read:clients.a.nested", "read:clients.b.nested", "read:clients.c"],
+        ["read:clients.b"],
+    ),
+    (["read:clients.a", "read:clients.b"], ["read:clients.a.people"]),
+    ([], ["read:clients"]),
+    (["update:.odd..names", "update:odd-names"], ["update:odd-names.x"]),
+]
+
+QUERIES = [
+    "read:*",
+    "read:clients",
+    "read:clients.a",
+    "read:clients.a.people",
+    "read:clients.b",
+    "read:clients.b.nested.deep",
+    "read:clients.secret",
+    "read:clients-secret",
+    "admin:*",
+    "admin:clients",
+    "admin:others",
+    "update:*",
+    "update:.odd",
+    "update:.odd..names.inside",
+    "update:odd-names",
+    "update:odd-names.x",
+    "delete:*",
+]
+
+
+def _cases() -> List[tuple]:
+    return [(p, f, q) for p, f in ABILITIES for q in QUERIES]
+
+
+class TestCompiledAbility:  # noqa: D101
+    def test_compile_is_cached(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:*"], [])
+        compiled = ability.compile()
+        assert isinstance(compiled, CompiledAbility)
+        assert compiled.ability is ability
+        assert ability.compile() is compiled
+        assert ability == build_ability(["read:*"], [])
+
+    def test_immutable(self) -> None:  # noqa: D102, D103
+        compiled = build_ability(["read:*"], []).compile()
+        with pytest.raises(AttributeError):
+            compiled.ability = build_ability([], [])
+
+    def test_copy(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:*"], ["read:secret"])
+        compiled = ability.compile()
+        for copied in [copy.deepcopy(ability), ability.model_copy(deep=True)]:
+            assert copied == ability
+            assert copied.compile() is not compiled
+            assert not copied.compile().can("read:secret")
+        assert copy.copy(ability).compile() is compiled
+        for compiled_copy in [
+            copy.deepcopy(compiled),
+            pickle.loads(pickle.dumps(compiled)),
+        ]:
+            assert isinstance(compiled_copy, CompiledAbility)
+            assert compiled_copy.ability == ability
+            assert compiled_copy.can("read:stuff")
+
+    @pytest.mark.parametrize("permitted, prohibited, query", _cases())
+    def test_same_results(  # noqa: D102, D103
+        self, permitted: List[str], prohibited: List[str], query: str
+    ) -> None:
+        ability: Ability = build_ability(permitted, prohibited)
+        compiled = ability.compile()
+        assert compiled.can(query) == ability.can(query)
+        assert compiled.cannot(query) == ability.cannot(query)
+        assert compiled.is_explicitly_prohibited(
+            query
+        ) == ability.is_explicitly_prohibited(query)
+        assert compiled.access_to_resources(query) == ability.access_to_resources(query)
+        _, resource = parse_query(query)
+        assert compiled.allowed_verbs(resource) == ability.allowed_verbs(resource)
+        assert compiled.can_any(["read", "admin"], resource) == ability.can_any(
+            ["read", "admin"], resource
+        )
+        assert compiled.can_all(["read", "admin"], resource) == ability.can_all(
+            ["read", "admin"], resource
+        )
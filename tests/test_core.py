@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the compact claim core and its conversions."""
+
+import pickle
+import random
+
+import pytest
+
+from claims import (
+    Ability,
+    Claim,
+    ClaimSet,
+    build_ability,
+    build_claim,
+    build_claim_set,
+)
+from claims.core import (
+    CoreAbility,
+    CoreClaim,
+    CoreClaimSet,
+    build_core_ability,
+    build_core_claim,
+    build_core_claim_set,
+)
+from claims.errors import InvalidClaimError, InvalidClaimVerbError
+
+
+class TestCore:  # noqa: D101
+    @pytest.mark.parametrize(
+        "raw, error",
+        [("read:stuff!#", InvalidClaimError), ("blah:what", InvalidClaimVerbError)],
+    )
+    def test_build_errors(self, raw: str, error: type) -> None:  # noqa: D102, D103
+        with pytest.raises(error):
+            build_core_claim_set(["read:valid", raw])
+
+    def test_build_claim(self) -> None:  # noqa: D102, D103
+        claim = build_core_claim("read:clients.*")
+        assert (claim.verb, claim.resource) == ("read", "clients")
+        assert str(build_core_claim({"verb": "read", "resource": None})) == "read:*"
+        assert build_core_claim(claim) is claim
+
+    def test_interned(self) -> None:  # noqa: D102, D103
+        resource = "".join(["clients", ".", "one"])
+        a = build_core_claim(("read", resource))
+        b = build_core_claim("read:clients.one")
+        assert a.resource is b.resource
+
+    def test_immutable(self) -> None:  # noqa: D102, D103
+        claim = build_core_claim("read:clients")
+        with pytest.raises(AttributeError):
+            claim.verb = "admin"
+        with pytest.raises(AttributeError):
+            build_core_claim_set([]).claims = ()
+
+    def test_claim_set_uniq_sort(self) -> None:  # noqa: D102, D103
+        core = build_core_claim_set(
+            [
+                "read:valid",
+                "admin:*",
+                ("read", "valid"),
+                {"verb": "admin", "resource": None},
+            ]
+        )
+        assert [str(c) for c in core] == ["admin:*", "read:valid"]
+        assert len(core) == 2
+
+        # CoreClaims are kept as given, the first of equal claims wins
+        claim = build_core_claim("read:valid")
+        mixed = build_core_claim_set(["read:valid", claim, "read:*", claim])
+        assert [str(c) for c in mixed] == ["read:*", "read:valid"]
+        assert build_core_claim_set([claim, "read:valid"]).claims[0] is claim
+
+    def test_check_and_can(self) -> None:  # noqa: D102, D103
+        core = build_core_ability(["read:clients", "admin:*"], ["read:clients.secret"])
+        ability = build_ability(["read:clients", "admin:*"], ["read:clients.secret"])
+        for query in [
+            "read:clients",
+            "read:clients.a",
+            "read:clients-other",
+            "read:clients.secret.stuff",
+            "admin:anything",
+            "read:*",
+        ]:
+            assert core.can(query) == ability.can(query)
+            assert core.cannot(query) == ability.cannot(query)
+            assert core.permitted.check(query) == ability.permitted.check(query)
+
+    def test_same_as_ability(self) -> None:  # noqa: D102, D103
+        rnd = random.Random(7)
+        segments = ["aa", "bb", "bb-c", "aab"]
+
+        def raw() -> str:
+            verb = rnd.choice(["read", "admin", "update"])
+            if rnd.random() < 0.05:
+                return f"{verb}:*"
+            depth = rnd.randint(1, 3)
+            return f"{verb}:" + ".".join(rnd.choice(segments) for _ in range(depth))
+
+        for _ in range(20):
+            permitted = [raw() for _ in range(rnd.randint(0, 12))]
+            prohibited = [raw() for _ in range(rnd.randint(0, 4))]
+            core = build_core_ability(permitted, prohibited)
+            ability = build_ability(permitted, prohibited)
+            queries = [raw() for _ in range(30)]
+            assert core.can_many(queries) == ability.can_many(queries)
+            for query in queries:
+                resource = build_claim(query).resource
+                for claim_set, core_set in [
+                    (ability.permitted, core.permitted),
+                    (ability.prohibited, core.prohibited),
+                ]:
+                    assert core_set.has_exact(query) == claim_set.has_exact(query)
+                    assert core_set.direct_children_of(
+                        query
+                    ) == claim_set.direct_children_of(query)
+                    assert core_set.direct_descendants_of(
+                        query
+                    ) == claim_set.direct_descendants_of(query)
+                assert core.allowed_verbs(resource) == ability.allowed_verbs(resource)
+                assert core.can_any(["read", "update"], resource) == ability.can_any(
+                    ["read", "update"], resource
+                )
+                assert core.can_all(["read", "update"], resource) == ability.can_all(
+                    ["read", "update"], resource
+                )
+                assert core.is_explicitly_prohibited(
+                    query
+                ) == ability.is_explicitly_prohibited(query)
+                assert core.access_to_resources(query) == ability.access_to_resources(
+                    query
+                )
+
+    def test_pickle_and_hash(self) -> None:  # noqa: D102, D103
+        core = build_core_ability(["read:clients", "admin:*"], ["read:clients.secret"])
+        loaded = pickle.loads(pickle.dumps(core))
+        assert loaded == core
+        assert hash(loaded) == hash(core)
+        assert isinstance(loaded.permitted.claims[0], CoreClaim)
+
+    def test_claim_round_trip(self) -> None:  # noqa: D102, D103
+        claim = Claim(verb="read", resource="clients")
+        core = claim.to_core()
+        assert core == CoreClaim("read", "clients")
+        assert Claim.from_core(core) == claim
+        assert Claim.from_core(core).model_dump() == claim.model_dump()
+
+    def test_claim_set_round_trip(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(["read:clients", "admin:*"])
+        core = claim_set.to_core()
+        assert isinstance(core, CoreClaimSet)
+        assert ClaimSet.from_core(core) == claim_set
+        assert ClaimSet.from_core(core).claims_strings() == ["admin:*", "read:clients"]
+
+    def test_ability_round_trip(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], ["read:clients.secret"])
+        core = ability.to_core()
+        assert isinstance(core, CoreAbility)
+        assert Ability.from_core(core) == ability
+        assert Ability.from_core(core).can("read:clients.one")
+
+    @pytest.mark.parametrize(
+        "raw",
+        ["read:what.some.stuff", "read:what", "read:*", "admin:what.some"],
+    )
+    def test_same_as_claim(self, raw: str) -> None:  # noqa: D102, D103
+        core = build_core_claim(raw)
+        claim = build_claim(raw)
+        for query in [
+            "read:*",
+            "admin:*",
+            "read:what",
+            "read:what.some",
+            "read:what.some.stuff",
+            "read:what.some.stuff.blah",
+            "read:what.som",
+            "read:what-some.stuff",
+            "read:unknown.some",
+            "admin:what",
+        ]:
+            assert core.check(query) == claim.check(query)
+            assert core.direct_child_of(query) == claim.direct_child_of(query)
+            assert core.direct_descendant_of(query) == claim.direct_descendant_of(query)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the ClaimIndex segment trie."""
+
+import pytest
+
+from claims.claim import Claim, build_claim
+from claims.index import MATCH, ClaimIndex, flags_of, verbs_with
+from claims.parsing import parse_query
+
+CLAIMS = [
+    "read:clients",
+    "read:clients.a.projects",
+    "admin:.hidden",
+    "admin:valid-one",
+    "update:*",
+    "delete:ab..cd",
+]
+
+
+class TestClaimIndex:  # noqa: D101
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "read:clients",
+            "read:clients.a",
+            "read:clients.a.projects.1",
+            "read:clients-other",
+            "read:client",
+            "read:*",
+            "admin:.hidden",
+            "admin:.hidden.stuff",
+            "admin:hidden",
+            "admin:valid",
+            "admin:valid-one.x",
+            "update:*",
+            "update:anything.at.all",
+            "delete:ab",
+            "delete:ab..cd.ef",
+            "create:clients",
+        ],
+    )
+    def test_check_same_as_claims(self, query: str) -> None:  # noqa: D102, D103
+        claims = [build_claim(c) for c in CLAIMS]
+        index = ClaimIndex(claims)
+        parsed = parse_query(query)
+        expected = any(c.check(parsed) for c in claims)
+        assert index.check(parsed.verb, parsed.segments) == expected
+
+    def test_check_empty(self) -> None:  # noqa: D102, D103
+        index = ClaimIndex([])
+        assert not index.check("read", ())
+        assert not index.check("read", ("clients",))
+
+    def test_with_claims_shares_untouched_nodes(self) -> None:  # noqa: D102, D103
+        index = ClaimIndex([build_claim(c) for c in CLAIMS])
+        derived = index.with_claims(
+            [build_claim("read:clients-other.x"), build_claim("create:new")]
+        )
+        assert derived.check("read", ("clients-other", "x"))
+        assert derived.check("create", ("new",))
+        assert derived.check("read", ("clients", "a", "projects"))
+        assert not index.check("read", ("clients-other", "x"))
+        assert not index.check("create", ("new",))
+        # the ".hidden" subtree is untouched, so it is the same object in both
+        assert derived.walk("admin", ("",))[1] is index.walk("admin", ("",))[1]
+        assert derived.walk("read", ())[1] is not index.walk("read", ())[1]
+        assert (
+            derived.walk("read", ("clients",))[1] is index.walk("read", ("clients",))[1]
+        )
+
+    def test_without_claims(self) -> None:  # noqa: D102, D103
+        index = ClaimIndex([build_claim(c) for c in CLAIMS])
+        derived = index.without_claims(
+            [
+                build_claim("read:clients"),
+                build_claim("update:*"),
+                build_claim("admin:.hidden"),
+                build_claim("admin:not-there"),
+            ]
+        )
+        assert not derived.check("read", ("clients", "b"))
+        assert derived.check("read", ("clients", "a", "projects"))
+        assert not derived.check("update", ("any",))
+        assert "update" not in derived.verbs()
+        assert not derived.check("admin", ("", "hidden"))
+        # the now empty path of "admin:.hidden" is gone
+        assert derived.walk("admin", ("",))[1] is None
+        assert index.check("read", ("clients", "b"))
+        assert index.check("admin", ("", "hidden"))
+        assert derived.walk("delete", ("ab",))[1] is index.walk("delete", ("ab",))[1]
+
+    def test_has_exact(self) -> None:  # noqa: D102, D103
+        index = ClaimIndex([build_claim(c) for c in CLAIMS])
+        assert index.has_exact("read", ("clients",))
+        assert index.has_exact("update", ())
+        assert not index.has_exact("read", ())
+        assert not index.has_exact("read", ("clients", "a"))
+        assert not index.has_exact("create", ("clients",))
+
+    def test_verbs_share_nodes(self) -> None:  # noqa: D102, D103
+        index = ClaimIndex(
+            [build_claim(c) for c in ["read:clients.a", "update:clients.a", "admin:*"]]
+        )
+        assert index.verbs() == ["admin", "read", "update"]
+        assert (
+            index.walk("read", ("clients", "a"))[1]
+            is index.walk("update", ("clients", "a"))[1]
+        )
+        assert index.walk("delete", ("clients", "a")) == (0, None)
+
+        bits, _ = index.walk_all(("clients", "a", "b"))
+        assert verbs_with(bits, MATCH) == ["admin", "read", "update"]
+        assert flags_of(bits, "read") == MATCH
+        assert flags_of(bits, "delete") == 0
+        assert verbs_with(index.walk_all(("clients",))[0], MATCH) == ["admin"]
+
+    def test_unknown_verb(self) -> None:  # noqa: D102, D103
+        # trusted claims are not validated, so their verb may not be an allowed one
+        index = ClaimIndex([Claim(verb="archive", resource="clients")])
+        assert index.check("archive", ("clients", "a"))
+        assert not index.check("read", ("clients", "a"))
+        assert index.verbs() == ["archive"]
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the streaming loaders of claim sets and abilities."""
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from claims import build_ability, build_claim_set
+from claims.loader import LoadReport, load_abilities, load_claim_sets
+
+JSONL = "\n".join(
+    [
+        json.dumps({"principal": "u1", "claims": ["read:clients", "admin:*"]}),
+        json.dumps({"principal": "u1", "claims": ["read:clients.*", "blah:what"]}),
+        "",
+        "not json",
+        json.dumps({"claims": ["read:clients"]}),
+        json.dumps(
+            {
+                "principal": 2,
+                "claims": [{"verb": "read", "resource": None}, ["read", "stuff"], 3],
+            }
+        ),
+        json.dumps({"principal": "u3", "claims": "read:clients"}),
+    ]
+)
+
+ABILITIES_CSV = """principal,claim,kind
+u1,read:clients,permitted
+u1,read:clients.secret,prohibited
+u1,read:bad!,permitted
+u2,admin:*,permitted
+u2,read:clients,other
+,read:clients,permitted
+u3,read:clients,prohibited
+"""
+
+
+class TestLoader:  # noqa: D101
+    def test_load_claim_sets_jsonl(self) -> None:  # noqa: D102, D103
+        report = LoadReport()
+        actual = list(load_claim_sets(io.StringIO(JSONL), report=report))
+        assert actual == [
+            ("u1", build_claim_set(["read:clients", "admin:*"])),
+            (2, build_claim_set(["read:*", "read:stuff"])),
+        ]
+        assert (report.records, report.principals, report.claims) == (3, 2, 7)
+        assert [
+            (e.line, e.principal, e.claim, e.error_type) for e in report.errors
+        ] == [
+            (2, "u1", "blah:what", "InvalidClaimVerbError"),
+            (4, None, None, "JSONDecodeError"),
+            (5, None, None, "ValueError"),
+            (6, 2, 3, "InvalidClaimError"),
+            (7, "u3", None, "ValueError"),
+        ]
+        assert report.error_count == 5
+
+    def test_load_abilities_csv(self, tmp_path: Path) -> None:  # noqa: D102, D103
+        path = tmp_path / "dump.csv"
+        path.write_text(ABILITIES_CSV, encoding="utf-8")
+        report = LoadReport()
+        actual = dict(load_abilities(path, file_format="csv", report=report))
+        assert actual == {
+            "u1": build_ability(["read:clients"], ["read:clients.secret"]),
+            "u2": build_ability(["admin:*"], []),
+            "u3": build_ability([], ["read:clients"]),
+        }
+        assert [(e.line, e.error_type) for e in report.errors] == [
+            (4, "InvalidClaimError"),
+            (6, "ValueError"),
+            (7, "ValueError"),
+        ]
+
+    def test_load_abilities_jsonl(self) -> None:  # noqa: D102, D103
+        line = {"user": "u1", "permitted": ["read:*"], "prohibited": ["read:secret"]}
+        stream = io.StringIO(json.dumps(line))
+        actual = list(load_abilities(stream, principal_field="user"))
+        assert actual == [("u1", build_ability(["read:*"], ["read:secret"]))]
+
+    def test_lazy(self) -> None:  # noqa: D102, D103
+        lines = [
+            json.dumps({"principal": f"u{i}", "claims": ["read:clients"]})
+            for i in range(100)
+        ]
+        report = LoadReport()
+        loader = load_claim_sets(io.StringIO("\n".join(lines)), report=report)
+        principal, _ = next(loader)
+        assert principal == "u0"
+        # only read up to the next principal
+        assert (report.records, report.principals) == (2, 1)
+
+    def test_claims_of_other_types(self) -> None:  # noqa: D102, D103
+        lines = [
+            {
+                "principal": "u1",
+                "claims": [
+                    {"verb": ["read"], "resource": "clients"},
+                    [["read"], "clients"],
+                    ["read", {"a": 1}],
+                    {"verb": "read", "resource": 3},
+                    {"verb": "read"},
+                ],
+            },
+            {"principal": "u2", "claims": ["read:clients"]},
+        ]
+        stream = io.StringIO("\n".join(json.dumps(line) for line in lines))
+        report = LoadReport()
+        actual = list(load_claim_sets(stream, report=report))
+        assert actual == [
+            ("u1", build_claim_set([])),
+            ("u2", build_claim_set(["read:clients"])),
+        ]
+        assert [e.error_type for e in report.errors] == [
+            "InvalidClaimVerbError",
+            "InvalidClaimVerbError",
+            "InvalidClaimResourceError",
+            "InvalidClaimResourceError",
+            "InvalidClaimError",
+        ]
+
+    def test_max_errors(self) -> None:  # noqa: D102, D103
+        lines = [json.dumps({"principal": "u1", "claims": ["bad", "worse"]})] * 3
+        report = LoadReport(max_errors=2)
+        list(load_claim_sets(io.StringIO("\n".join(lines)), report=report))
+        assert report.error_count == 6
+        assert len(report.errors) == 2
+        assert "error_count=6" in repr(report)
+
+    def test_unsupported_format(self) -> None:  # noqa: D102, D103
+        with pytest.raises(ValueError):
+            list(load_claim_sets(io.StringIO(""), file_format="xml"))
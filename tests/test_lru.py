@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the LRU cache behind the parse cache and the decision memos."""
+
+from typing import List
+
+import pytest
+
+from claims.lru import LRUCache
+
+
+class TestLRUCache:  # noqa: D101
+    def test_invalid_capacity(self) -> None:  # noqa: D102, D103
+        with pytest.raises(ValueError):
+            LRUCache(capacity=0)
+
+    def test_get_or_compute(self) -> None:  # noqa: D102, D103
+        cache: LRUCache[str, int] = LRUCache(capacity=2)
+        computed: List[str] = []
+
+        def compute(key: str) -> int:
+            computed.append(key)
+            return len(key)
+
+        assert cache.get_or_compute("a", lambda: compute("a")) == 1
+        assert cache.get_or_compute("bb", lambda: compute("bb")) == 2
+        assert cache.get_or_compute("a", lambda: compute("a")) == 1
+        # "bb" is the least recently used
+        assert cache.get_or_compute("ccc", lambda: compute("ccc")) == 3
+        assert cache.get_or_compute("bb", lambda: compute("bb")) == 2
+        assert computed == ["a", "bb", "ccc", "bb"]
+        stats = cache.stats()
+        assert (stats.size, stats.hits, stats.misses, stats.evictions) == (2, 1, 4, 2)
+        assert stats.hit_rate == pytest.approx(1 / 5)
+
+    def test_falsy_values(self) -> None:  # noqa: D102, D103
+        cache: LRUCache[str, bool] = LRUCache()
+        assert cache.get_or_compute("a", lambda: False) is False
+        assert cache.get_or_compute("a", lambda: True) is False
+        assert cache.stats().hits == 1
+
+    def test_clear(self) -> None:  # noqa: D102, D103
+        cache: LRUCache[str, int] = LRUCache()
+        cache.get_or_compute("a", lambda: 1)
+        cache.clear()
+        assert cache.stats().size == 0
+        assert cache.stats().misses == 1
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the AbilityMatrix (requires numpy)."""
+
+import random
+from typing import Any, List, Sequence
+
+import pytest
+
+from claims import Ability, build_ability
+from claims.matrix import AbilityMatrix
+from claims.parsing import RawQuery
+
+np = pytest.importorskip("numpy")
+
+ABILITIES = [
+    build_ability([], []),
+    build_ability(["read:*"], []),
+    build_ability(["read:*"], ["read:clients.secret"]),
+    build_ability(["read:clients", "admin:clients.one"], ["read:clients.one.x"]),
+    build_ability(["read:clients.one"], ["read:*"]),
+    build_ability(["admin:*", "read:clients-one"], ["admin:clients"]),
+]
+
+QUERIES: List[RawQuery] = [
+    "read:*",
+    "read:clients",
+    "read:clients.one",
+    "read:clients.one.x",
+    "read:clients.one.xy",
+    "read:clients-one",
+    "read:clients.secret.stuff",
+    "admin:clients.one",
+    "admin:other",
+    ("admin", None),
+    "delete:clients",
+]
+
+
+def _expected(abilities: Sequence[Ability], queries: Sequence[RawQuery]) -> Any:
+    return np.array([[a.can(q) for q in queries] for a in abilities], dtype=bool)
+
+
+class TestAbilityMatrix:  # noqa: D101
+    def test_same_as_can(self) -> None:  # noqa: D102, D103
+        matrix = AbilityMatrix(ABILITIES)
+        actual = matrix.can_many(QUERIES)
+        assert actual.shape == (len(ABILITIES), len(QUERIES))
+        assert actual.dtype == bool
+        assert (actual == _expected(ABILITIES, QUERIES)).all()
+
+    def test_can(self) -> None:  # noqa: D102, D103
+        matrix = AbilityMatrix(ABILITIES)
+        assert len(matrix) == len(ABILITIES)
+        assert matrix.can("read:clients.one").tolist() == [
+            a.can("read:clients.one") for a in ABILITIES
+        ]
+
+    def test_empty(self) -> None:  # noqa: D102, D103
+        assert AbilityMatrix([]).can_many(QUERIES).shape == (0, len(QUERIES))
+        assert AbilityMatrix(ABILITIES).can_many([]).shape == (len(ABILITIES), 0)
+
+    def test_same_as_can_random(self) -> None:  # noqa: D102, D103
+        rng = random.Random(17)
+        segments = ["aa", "bb", "cc"]
+
+        def raw() -> str:
+            depth = rng.randint(0, 3)
+            resource = ".".join(rng.choice(segments) for _ in range(depth))
+            return f"{rng.choice(['read', 'admin'])}:{resource or '*'}"
+
+        abilities: List[Ability] = [
+            build_ability(
+                [raw() for _ in range(rng.randint(0, 6))],
+                [raw() for _ in range(rng.randint(0, 3))],
+            )
+            for _ in range(30)
+        ]
+        queries = [raw() for _ in range(80)]
+        actual = AbilityMatrix(abilities).can_many(queries)
+        assert (actual == _expected(abilities, queries)).all()
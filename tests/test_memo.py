@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the memo of decisions of an Ability."""
+
+import copy
+
+import key_set
+import pytest
+
+from claims import build_ability, build_claim_set
+from claims.memo import DecisionMemo
+from claims.parsing import parse_query
+
+
+class TestDecisionMemo:  # noqa: D101
+    def test_invalid_capacity(self) -> None:  # noqa: D102, D103
+        with pytest.raises(ValueError):
+            DecisionMemo(capacity=0)
+
+    def test_disabled_by_default(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], [])
+        assert ability.get_memo() is None
+
+    def test_enable_disable(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], [])
+        memo = ability.enable_memo(capacity=10)
+        assert ability.get_memo() is memo
+        ability.disable_memo()
+        assert ability.get_memo() is None
+
+    def test_same_results(self) -> None:  # noqa: D102, D103
+        plain = build_ability(["read:clients", "admin:*"], ["read:clients.secret"])
+        memoized = build_ability(["read:clients", "admin:*"], ["read:clients.secret"])
+        memoized.enable_memo()
+        queries = [
+            "read:clients",
+            "read:clients.secret",
+            "read:clients.secret.one",
+            "read:*",
+            "admin:stuff",
+            "delete:clients",
+        ]
+        for _ in range(2):
+            for query in queries:
+                assert memoized.can(query) == plain.can(query)
+                assert memoized.cannot(query) == plain.cannot(query)
+                assert memoized.is_explicitly_prohibited(
+                    query
+                ) == plain.is_explicitly_prohibited(query)
+                assert memoized.access_to_resources(query) == plain.access_to_resources(
+                    query
+                )
+
+    def test_keyed_by_normalized_query(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], ["read:clients.secret"])
+        memo = ability.enable_memo()
+        assert ability.can("read:clients.*")
+        assert ability.can(("read", "clients"))
+        assert not ability.cannot({"verb": "read", "resource": "clients"})
+        assert ability.can(parse_query("read:clients"))
+        stats = memo.stats()
+        assert (stats.size, stats.hits, stats.misses) == (1, 3, 1)
+        assert stats.hit_rate == pytest.approx(3 / 4)
+
+    def test_operations_apart(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], ["read:clients.secret"])
+        memo = ability.enable_memo()
+        assert not ability.can("read:clients.secret")
+        assert ability.is_explicitly_prohibited("read:clients.secret")
+        actual = ability.access_to_resources("read:clients.secret")
+        assert isinstance(actual, key_set.KeySetNone)
+        assert ability.access_to_resources("read:clients.secret") is actual
+        assert memo.stats()[:4] == (3, 1024, 1, 3)
+
+    def test_evicts_least_recently_used(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], [])
+        memo = ability.enable_memo(capacity=2)
+        ability.can("read:clients.one")
+        ability.can("read:clients.two")
+        ability.can("read:clients.one")
+        ability.can("read:clients.three")
+        assert memo.stats().evictions == 1
+        ability.can("read:clients.one")
+        assert memo.stats().hits == 2
+        memo.clear()
+        assert memo.stats().size == 0
+
+    def test_not_copied_on_update(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], [])
+        ability.enable_memo()
+        assert ability.can("read:clients")
+        copied = ability.model_copy(update={"permitted": build_claim_set([])})
+        assert copied.get_memo() is None
+        assert copied.cannot("read:clients")
+        assert ability.model_copy().get_memo() is ability.get_memo()
+
+    def test_not_deep_copied(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], [])
+        ability.enable_memo()
+        assert ability.can("read:clients")
+        for copied in [copy.deepcopy(ability), ability.model_copy(deep=True)]:
+            assert copied == ability
+            assert copied.get_memo() is None
+            assert copied.can("read:clients")
+        assert ability.get_memo() is not None
+
+    def test_not_derived(self) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], [])
+        ability.enable_memo()
+        assert ability.can("read:clients.secret")
+        derived = ability.with_extra_prohibited_if_not_checked(["read:clients.secret"])
+        assert derived.get_memo() is None
+        assert derived.cannot("read:clients.secret")
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the parsing functions and the parse cache."""
+
+import gc
+import pickle
+import weakref
+from typing import Any, Iterator
+
+import pytest
+
+from claims import build_claim
+from claims.errors import (
+    InvalidClaimError,
+    InvalidClaimResourceError,
+    InvalidClaimVerbError,
+)
+from claims.parsing import (
+    ParseCache,
+    RawQuery,
+    disable_parse_cache,
+    enable_parse_cache,
+    extract_resource,
+    extract_trusted_verb_resource,
+    extract_verb_resource,
+    get_parse_cache,
+    mask_verbs,
+    parse_query,
+    verb_mask,
+)
+
+
+@pytest.fixture
+def cache() -> Iterator[ParseCache]:  # noqa: D103
+    yield enable_parse_cache(capacity=2)
+    disable_parse_cache()
+
+
+class TestParseCache:  # noqa: D101
+    def test_disabled_by_default(self) -> None:  # noqa: D102, D103
+        assert get_parse_cache() is None
+
+    def test_enable_disable(self, cache: ParseCache) -> None:  # noqa: D102, D103
+        assert get_parse_cache() is cache
+        disable_parse_cache()
+        assert get_parse_cache() is None
+
+    def test_invalid_capacity(self) -> None:  # noqa: D102, D103
+        with pytest.raises(ValueError):
+            ParseCache(capacity=0)
+
+    def test_hits_and_misses(self, cache: ParseCache) -> None:  # noqa: D102, D103
+        assert extract_verb_resource("read:clients") == ("read", "clients")
+        assert extract_verb_resource("read:clients") == ("read", "clients")
+        assert extract_verb_resource("read:*") == ("read", None)
+        stats = cache.stats()
+        assert (stats.size, stats.hits, stats.misses, stats.evictions) == (2, 1, 2, 0)
+        assert stats.hit_rate == pytest.approx(1 / 3)
+        assert stats._asdict()["capacity"] == 2
+
+    def test_tuples_are_not_cached(self, cache: ParseCache) -> None:  # noqa: D102, D103
+        assert extract_verb_resource(("read", "clients")) == ("read", "clients")
+        assert cache.stats().misses == 0
+
+    def test_evicts_least_recently_used(  # noqa: D102, D103
+        self, cache: ParseCache
+    ) -> None:
+        extract_verb_resource("read:aa")
+        extract_verb_resource("read:bb")
+        extract_verb_resource("read:aa")
+        extract_verb_resource("read:cc")
+        assert cache.stats().evictions == 1
+        extract_verb_resource("read:aa")
+        assert cache.stats().hits == 2
+        extract_verb_resource("read:bb")
+        assert cache.stats().misses == 4
+
+    @pytest.mark.parametrize(
+        "raw, error",
+        [("read:stuff!#", InvalidClaimError), ("blah:what", InvalidClaimVerbError)],
+    )
+    def test_caches_errors(  # noqa: D102, D103
+        self, cache: ParseCache, raw: str, error: type
+    ) -> None:
+        for _ in range(2):
+            with pytest.raises(error):
+                extract_verb_resource(raw)
+        assert cache.stats().hits == 1
+        assert cache.stats().misses == 1
+
+    def test_errors_raised_as_new_instances(  # noqa: D102, D103
+        self, cache: ParseCache
+    ) -> None:
+        class Marker:
+            pass
+
+        def lookup() -> "weakref.ref[Marker]":
+            marker = Marker()
+            try:
+                extract_verb_resource("read:stuff!#")
+            except InvalidClaimError:
+                pass
+            return weakref.ref(marker)
+
+        errors = []
+        for _ in range(2):
+            ref = lookup()
+            gc.collect()
+            # the frames of the caller are not kept by the cache
+            assert ref() is None
+            with pytest.raises(InvalidClaimError) as info:
+                extract_verb_resource("read:stuff!#")
+            errors.append(info.value)
+        assert errors[0] is not errors[1]
+        assert str(errors[0]) == str(errors[1])
+        assert errors[0].raw == "read:stuff!#"
+
+    def test_clear(self, cache: ParseCache) -> None:  # noqa: D102, D103
+        extract_verb_resource("read:clients")
+        cache.clear()
+        assert cache.stats().size == 0
+        extract_verb_resource("read:clients")
+        assert cache.stats().misses == 2
+
+
+class TestParsedQuery:  # noqa: D101
+    def test_parse_query(self) -> None:  # noqa: D102, D103
+        parsed = parse_query("read:clients.a.projects")
+        assert parsed.verb == "read"
+        assert parsed.resource == "clients.a.projects"
+        assert parsed.segments == ("clients", "a", "projects")
+        assert parsed.prefix == "clients.a.projects."
+        assert parse_query(parsed) is parsed
+
+    def test_parse_query_global(self) -> None:  # noqa: D102, D103
+        parsed = parse_query({"verb": "read", "resource": None})
+        assert parsed.segments == ()
+        assert parsed.prefix is None
+        assert parsed == parse_query("read:*")
+
+    def test_unpacks_like_tuple(self) -> None:  # noqa: D102, D103
+        verb, resource = parse_query(("admin", "stuff"))
+        assert (verb, resource) == ("admin", "stuff")
+        assert extract_verb_resource(parse_query("admin:stuff")) == ("admin", "stuff")
+
+    def test_immutable_hashable_picklable(self) -> None:  # noqa: D102, D103
+        parsed = parse_query("read:clients")
+        with pytest.raises(AttributeError):
+            parsed.verb = "admin"
+        assert {parsed: 1}[parse_query("read:clients")] == 1
+        assert pickle.loads(pickle.dumps(parsed)) == parsed
+
+    @pytest.mark.parametrize("raw", ["blah:what", ("read", "bad!")])
+    def test_parse_query_errors(self, raw: RawQuery) -> None:  # noqa: D102, D103
+        with pytest.raises((InvalidClaimVerbError, InvalidClaimResourceError)):
+            parse_query(raw)
+
+    def test_cached(self, cache: ParseCache) -> None:  # noqa: D102, D103
+        parsed = parse_query("read:clients")
+        assert parse_query("read:clients") is parsed
+        assert cache.stats().hits == 1
+
+
+class TestTrusted:  # noqa: D101
+    @pytest.mark.parametrize(
+        "raw",
+        [
+            "read:*",
+            "read:clients",
+            "read:clients.*",
+            "read:clients.one-two_3",
+            ("read", "clients"),
+            ("read", None),
+            ("read", ""),
+            {"verb": "read", "resource": "clients"},
+            parse_query("read:clients"),
+        ],
+    )
+    def test_same_as_validated(self, raw: RawQuery) -> None:  # noqa: D102, D103
+        assert extract_trusted_verb_resource(raw) == extract_verb_resource(raw)
+
+
+class TestVerbs:  # noqa: D101
+    def test_verb_mask(self) -> None:  # noqa: D102, D103
+        assert verb_mask([]) == 0
+        assert verb_mask(["admin", "read"]) == 0b11
+        assert mask_verbs(verb_mask(["manage", "read", "read"])) == ["read", "manage"]
+        with pytest.raises(InvalidClaimVerbError):
+            verb_mask(["read", "blah"])
+        with pytest.raises(InvalidClaimVerbError):
+            verb_mask([["read"]])  # type: ignore[list-item]
+
+    @pytest.mark.parametrize(
+        "raw",
+        [
+            (["read"], "clients"),
+            {"verb": ["read"], "resource": "clients"},
+            ({"a": 1}, None),
+        ],
+    )
+    def test_unhashable_verb(self, raw: Any) -> None:  # noqa: D102, D103
+        with pytest.raises(InvalidClaimVerbError):
+            extract_verb_resource(raw)
+        with pytest.raises(InvalidClaimVerbError):
+            build_claim(raw)
+
+    def test_extract_resource(self) -> None:  # noqa: D102, D103
+        assert extract_resource("clients.one") == "clients.one"
+        assert extract_resource(None) is None
+        assert extract_resource("") is None
+        with pytest.raises(InvalidClaimResourceError):
+            extract_resource("clients!")
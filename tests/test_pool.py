@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the interning pool of ClaimSet and Ability."""
+
+import gc
+from typing import Iterator
+
+import pytest
+
+from claims import build_ability, build_claim_set
+from claims.pool import (
+    InternPool,
+    disable_intern_pool,
+    enable_intern_pool,
+    get_intern_pool,
+)
+
+
+@pytest.fixture
+def pool() -> Iterator[InternPool]:  # noqa: D103
+    yield enable_intern_pool()
+    disable_intern_pool()
+
+
+class TestInternPool:  # noqa: D101
+    def test_disabled_by_default(self) -> None:  # noqa: D102, D103
+        assert get_intern_pool() is None
+        assert build_claim_set(["read:*"]) is not build_claim_set(["read:*"])
+
+    def test_enable_disable(self, pool: InternPool) -> None:  # noqa: D102, D103
+        assert get_intern_pool() is pool
+        disable_intern_pool()
+        assert get_intern_pool() is None
+
+    def test_build_claim_set(self, pool: InternPool) -> None:  # noqa: D102, D103
+        a = build_claim_set(["read:clients", "admin:*"])
+        b = build_claim_set(["admin:*", "read:clients.*", "read:clients"])
+        c = build_claim_set([("admin", None), "read:clients"], trusted=True)
+        assert a is b is c
+        assert build_claim_set(a) is a
+        other = build_claim_set(["read:clients"])
+        assert other is not a
+        stats = pool.stats()
+        assert (stats.claim_sets, stats.hits, stats.misses) == (2, 3, 2)
+        assert stats.hit_rate == pytest.approx(3 / 5)
+
+    def test_already_built_joins_the_pool(  # noqa: D102, D103
+        self, pool: InternPool
+    ) -> None:
+        disable_intern_pool()
+        outside = build_claim_set(["read:clients"])
+        enable_intern_pool()
+        assert build_claim_set(outside) is build_claim_set(["read:clients"])
+
+    def test_build_ability(self, pool: InternPool) -> None:  # noqa: D102, D103
+        a = build_ability(["read:clients"], ["read:clients.secret"])
+        b = build_ability(["read:clients.*"], ["read:clients.secret"])
+        assert a is b
+        other = build_ability(["read:clients.secret"], ["read:clients"])
+        assert other is not a
+        assert pool.stats().abilities == 2
+
+    def test_derivations(self, pool: InternPool) -> None:  # noqa: D102, D103
+        base = build_ability(["read:clients"], [])
+        extra = base.with_extra_prohibited_if_not_checked(["read:clients.secret"])
+        assert extra is build_ability(["read:clients"], ["read:clients.secret"])
+        assert extra.without_exact_prohibited("read:clients.secret") is base
+
+        claim_set = build_claim_set(["read:clients"])
+        added = claim_set.add_if_not_checked("admin:clients")
+        assert added is build_claim_set(["read:clients", "admin:clients"])
+        assert added.without_exact("admin:clients") is claim_set
+
+    def test_derivation_keeps_indexed(  # noqa: D102, D103
+        self, pool: InternPool
+    ) -> None:
+        shared = build_claim_set(["read:clients", "admin:clients"])
+        indexed = build_claim_set(["read:clients"], indexed=True)
+        derived = indexed.add_if_not_checked("admin:clients")
+        assert derived is shared
+        assert derived.is_indexed()
+
+    def test_unused_are_evicted(self, pool: InternPool) -> None:  # noqa: D102, D103
+        ability = build_ability(["read:clients"], ["read:clients.secret"])
+        assert pool.stats()[:2] == (2, 1)
+        del ability
+        gc.collect()
+        assert pool.stats()[:2] == (0, 0)
+
+    def test_clear(self, pool: InternPool) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(["read:clients"])
+        pool.clear()
+        assert pool.stats().claim_sets == 0
+        assert build_claim_set(["read:clients"]) is not claim_set
+        assert pool.stats().misses == 2
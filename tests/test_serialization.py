@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the compact binary encoding of ClaimSet and Ability."""
+
+import pickle
+
+import pytest
+
+from claims import Ability, ClaimSet, build_ability, build_claim_set
+from claims.serialization import KIND_ABILITY, KIND_CLAIM_SET, MAGIC, dump
+
+PERMITTED = [
+    "read:*",
+    "admin:clients.1.name",
+    "admin:clients.1.phone",
+    "admin:clients.12",
+    "create:cliénts.ñu",
+    "update:clients.x-1_2",
+]
+PROHIBITED = ["delete:clients", "admin:clients.1.phone.home"]
+
+
+def _replace_byte(data: bytes, position: int, value: int) -> bytes:
+    return data[:position] + bytes([value]) + data[position + 1 :]
+
+
+class TestSerialization:  # noqa: D101
+    @pytest.mark.parametrize("claims", [[], ["read:*"], PERMITTED, PROHIBITED])
+    def test_claim_set_round_trip(self, claims: list) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(claims)
+        loaded = ClaimSet.from_bytes(claim_set.to_bytes())
+        assert loaded == claim_set
+        assert loaded.claims_strings() == claim_set.claims_strings()
+        assert not loaded.is_indexed()
+
+    def test_ability_round_trip(self) -> None:  # noqa: D102, D103
+        ability = build_ability(PERMITTED, PROHIBITED)
+        loaded = Ability.from_bytes(ability.to_bytes())
+        assert loaded == ability
+        assert loaded.can("admin:clients.1.name")
+        assert loaded.cannot("admin:clients.1.phone.home")
+        assert loaded.access_to_resources("admin:clients") == (
+            ability.access_to_resources("admin:clients")
+        )
+
+    def test_keeps_indexed(self) -> None:  # noqa: D102, D103
+        ability = build_ability(PERMITTED, PROHIBITED, indexed=True)
+        loaded = Ability.from_bytes(ability.to_bytes())
+        assert loaded.permitted.is_indexed() and loaded.prohibited.is_indexed()
+        assert loaded.permitted.check("admin:clients.1.name.first")
+
+    def test_shared_prefixes(self) -> None:  # noqa: D102, D103
+        claims = [f"read:organisations.main.clients.{i}" for i in range(10, 30)]
+        data = build_claim_set(claims).to_bytes()
+        assert len(data) < sum(len(c) for c in claims) / 4
+
+    def test_pickle(self) -> None:  # noqa: D102, D103
+        ability = build_ability(PERMITTED, PROHIBITED)
+        data = pickle.dumps(ability)
+        assert ability.to_bytes() in data
+        assert pickle.loads(data) == ability
+
+        claim_set = build_claim_set(PERMITTED, indexed=True)
+        loaded = pickle.loads(pickle.dumps(claim_set))
+        assert loaded == claim_set
+        assert loaded.is_indexed()
+
+    def test_derive_after_load(self) -> None:  # noqa: D102, D103
+        loaded = Ability.from_bytes(build_ability(PERMITTED, PROHIBITED).to_bytes())
+        derived = loaded.with_extra_prohibited_if_not_checked(["update:clients.x-1_2"])
+        assert derived.cannot("update:clients.x-1_2")
+        assert loaded.can("update:clients.x-1_2")
+
+    @pytest.mark.parametrize(
+        "data, message",
+        [
+            (b"JSON{}", "not an encoded"),
+            (MAGIC + b"\x02\x01", "version"),
+            (dump(KIND_ABILITY, [([], 0), ([], 0)]), "kind"),
+            (build_claim_set(PERMITTED).to_bytes()[:-3], "truncated"),
+            (build_claim_set(PERMITTED).to_bytes() + b"\x00", "trailing"),
+            (
+                _replace_byte(build_claim_set(["read:clients"]).to_bytes(), 8, 0x7E),
+                "verb id",
+            ),
+            (
+                _replace_byte(build_claim_set(["read:clients"]).to_bytes(), 9, 5),
+                "shared prefix",
+            ),
+        ],
+    )
+    def test_invalid_data(self, data: bytes, message: str) -> None:  # noqa: D102, D103
+        with pytest.raises(ValueError, match=message):
+            ClaimSet.from_bytes(data)
+
+    def test_kind(self) -> None:  # noqa: D102, D103
+        data = dump(KIND_CLAIM_SET, [([("read", None)], 0)])
+        with pytest.raises(ValueError, match="kind"):
+            Ability.from_bytes(data)
+
+    def test_unknown_verb(self) -> None:  # noqa: D102, D103
+        claim_set = build_claim_set(["blah:clients"], trusted=True)
+        with pytest.raises(ValueError, match="blah"):
+            claim_set.to_bytes()
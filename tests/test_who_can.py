@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""Test suite for the WhoCanIndex."""
+
+import copy
+import pickle
+import random
+from typing import Dict, FrozenSet, Hashable, List
+
+import pytest
+
+from claims import Ability, build_ability
+from claims.who_can import WhoCanIndex
+
+READER = build_ability(["read:clients"], ["read:clients.secret"])
+ADMIN = build_ability(["admin:*", "read:*"], [])
+GUEST = build_ability(["read:clients.public"], [])
+
+
+def _expected(abilities: Dict[Hashable, Ability], query: str) -> FrozenSet[Hashable]:
+    return frozenset(id_ for id_, ability in abilities.items() if ability.can(query))
+
+
+class TestWhoCanIndex:  # noqa: D101
+    def test_who_can(self) -> None:  # noqa: D102, D103
+        index = WhoCanIndex([(1, READER), (2, ADMIN), (3, READER), ("guest", GUEST)])
+        assert len(index) == 4
+        assert index.group_count() == 3
+        assert index.who_can("read:clients") == {1, 2, 3}
+        assert index.who_can("read:clients.secret.one") == {2}
+        assert index.who_can("read:clients.public") == {1, 2, 3, "guest"}
+        assert index.who_can("admin:stuff") == {2}
+        assert index.who_can("delete:stuff") == frozenset()
+
+    def test_repeated_id_keeps_last(self) -> None:  # noqa: D102, D103
+        index = WhoCanIndex([(1, READER), (1, GUEST)])
+        assert len(index) == 1
+        assert index.group_count() == 1
+        assert index.who_can("read:clients") == frozenset()
+        assert index.who_can("read:clients.public") == {1}
+
+    def test_immutable(self) -> None:  # noqa: D102, D103
+        index = WhoCanIndex()
+        with pytest.raises(AttributeError):
+            index._members = {}
+
+    def test_with_ability(self) -> None:  # noqa: D102, D103
+        index = WhoCanIndex([(1, READER), (2, READER)])
+        derived = index.with_ability(1, ADMIN)
+        assert derived.who_can("admin:stuff") == {1}
+        assert derived.who_can("read:clients") == {1, 2}
+        assert derived.who_can("read:clients.secret") == {1}
+        assert derived.group_count() == 2
+        # untouched
+        assert index.who_can("admin:stuff") == frozenset()
+        assert index.who_can("read:clients.secret") == frozenset()
+        assert index.group_count() == 1
+
+        added = derived.with_ability(3, GUEST)
+        assert 3 in added and 3 not in derived
+        assert added.who_can("read:clients.public") == {1, 2, 3}
+
+    def test_without_id(self) -> None:  # noqa: D102, D103
+        index = WhoCanIndex([(1, READER), (2, ADMIN)])
+        assert index.without_id(3) is index
+        derived = index.without_id(2)
+        assert list(derived) == [1]
+        assert derived.group_count() == 1
+        assert derived.who_can("read:*") == frozenset()
+        assert index.who_can("read:*") == {2}
+
+    def test_copy(self) -> None:  # noqa: D102, D103
+        index = WhoCanIndex([(1, READER), (2, ADMIN), ("guest", GUEST)])
+        for copied in [pickle.loads(pickle.dumps(index)), copy.deepcopy(index)]:
+            assert isinstance(copied, WhoCanIndex)
+            assert set(copied) == {1, 2, "guest"}
+            assert copied.group_count() == 3
+            assert copied.who_can("read:clients.public") == {1, 2, "guest"}
+            derived = copied.with_ability(4, READER).without_id(2)
+            assert derived.who_can("read:clients") == {1, 4}
+            assert derived.group_count() == 2
+        assert index.who_can("read:clients") == {1, 2}
+
+    def test_shared_claims(self) -> None:  # noqa: D102, D103
+        pairs = [
+            (i, build_ability(["read:clients", f"read:users.u{i}"], []))
+            for i in range(200)
+        ]
+        index = WhoCanIndex(pairs)
+        assert index.group_count() == 200
+        assert index.who_can("read:clients.one") == set(range(200))
+        assert index.who_can("read:users.u7") == {7}
+        assert index.without_id(7).who_can("read:users.u7") == frozenset()
+
+    def test_same_as_can_random(self) -> None:  # noqa: D102, D103
+        rng = random.Random(23)
+        segments = ["aa", "bb", "cc"]
+
+        def raw() -> str:
+            depth = rng.randint(0, 3)
+            resource = ".".join(rng.choice(segments) for _ in range(depth))
+            return f"{rng.choice(['read', 'admin'])}:{resource or '*'}"
+
+        roles: List[Ability] = [
+            build_ability(
+                [raw() for _ in range(rng.randint(0, 5))],
+                [raw() for _ in range(rng.randint(0, 3))],
+            )
+            for _ in range(8)
+        ]
+        abilities: Dict[Hashable, Ability] = {i: rng.choice(roles) for i in range(60)}
+        index = WhoCanIndex(abilities.items())
+        for _ in range(30):
+            id_ = rng.randrange(70)
+            if rng.random() < 0.2:
+                abilities.pop(id_, None)
+                index = index.without_id(id_)
+            else:
+                abilities[id_] = rng.choice(roles)
+                index = index.with_ability(id_, abilities[id_])
+
+        assert set(index) == set(abilities)
+        for query in [raw() for _ in range(60)]:
+            assert index.who_can(query) == _expected(abilities, query)